@@ -0,0 +1,124 @@
+"""Duplicate fetches saved by url canonicalization, on a synthetic link corpus
+where every page is linked under several spellings: host case, default ports,
+dot segments, percent-encoding, query order, tracking and session parameters,
+and www. vs the bare host. Also urls/sec of UrlCanonicalizer.canonicalize_many.
+
+    python -m benchmarks.bench_canonicalize --pages 20000 --links 500000
+
+Links are "fetched" in corpus order the first time their frontier key is new,
+the way Frontier.add_url dedups them, so www./bare merging is only credited
+once UrlCanonicalizer.observe has learned it from fetched pages.
+"""
+import random
+import time
+from argparse import ArgumentParser
+
+from utils import get_urlhash, normalize
+from utils.canonicalize import UrlCanonicalizer
+
+
+def make_corpus(pages, links, seed=0):
+    ''' Returns (links, page id of each link). Hosts come in www./bare pairs; a
+    third of them serve the same site under both names. '''
+    rng = random.Random(seed)
+    hosts = [f"dept{i}.uci.edu" for i in range(max(1, pages // 200))]
+    mirrored = set(hosts[::3])
+    base = list()
+    for i in range(pages):
+        host = hosts[i % len(hosts)]
+        path = rng.choice(["/people/", "/research/", "/~user/", "/news/view", "/a b/", "/café/"])
+        query = rng.choice(["", "", "id={}".format(i), "id={}&page=2".format(i), "q=x&lang=en"])
+        base.append((host, f"{path}{i}", query))
+    corpus, ids = list(), list()
+    for _ in range(links):
+        i = int(rng.paretovariate(1.2)) % pages if rng.random() < 0.5 else rng.randrange(pages)
+        host, path, query = base[i]
+        scheme = "https"
+        if host in mirrored and rng.random() < 0.5:
+            host = "www." + host
+        r = rng.random()
+        if r < 0.05:
+            host = host.upper()
+        elif r < 0.1:
+            host += ":443"
+        if rng.random() < 0.05:
+            path = path.replace("/", "/x/../", 1)
+        elif rng.random() < 0.05:
+            path = path.replace("e", "%65")
+        if rng.random() < 0.1:
+            path += "/"
+        params = query.split("&") if query else []
+        if rng.random() < 0.2:
+            rng.shuffle(params)
+        if rng.random() < 0.1:
+            params.append(f"utm_source=feed{rng.randrange(5)}")
+        if rng.random() < 0.05:
+            params.append(f"sid={rng.randrange(1 << 30):x}")
+        url = f"{scheme}://{host}{path}" + ("?" + "&".join(params) if params else "")
+        if rng.random() < 0.1:
+            url += "#section"
+        corpus.append(url)
+        ids.append(i)
+    return corpus, ids
+
+
+def crawl_old(corpus):
+    """Fetches made with the old frontier key: normalize() then get_urlhash()."""
+    seen = set()
+    for url in corpus:
+        seen.add(get_urlhash(normalize(url.split("#", 1)[0])))
+    return len(seen)
+
+
+def crawl_new(corpus, ids):
+    """Fetches made with canonical urls, learning www./bare aliases from what was fetched."""
+    canonicalizer = UrlCanonicalizer()
+    seen = set()
+    fetches = 0
+    for url, page in zip(corpus, ids):
+        canonical = canonicalizer.canonicalize(url)
+        urlhash = get_urlhash(canonical)
+        if urlhash in seen:
+            continue
+        seen.add(urlhash)
+        fetches += 1
+        canonicalizer.observe(canonical, page)
+    return fetches, len(canonicalizer.aliases)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--links", type=int, default=500000)
+    args = parser.parse_args()
+    corpus, ids = make_corpus(args.pages, args.links)
+    pages = len(set(ids))
+
+    old = crawl_old(corpus)
+    new, aliases = crawl_new(corpus, ids)
+    print(f"{args.links} links to {pages} distinct pages")
+    print(f"  old normalize: {old} fetches ({old - pages} duplicates)")
+    print(f"  canonical:     {new} fetches ({new - pages} duplicates), {aliases} host aliases learned")
+    print(f"  duplicate fetches cut by {1 - (new - pages) / max(1, old - pages):.1%}, "
+          f"total fetches by {1 - new / old:.1%}")
+
+    start = time.perf_counter()
+    for url in corpus:
+        normalize(url)
+    old_elapsed = time.perf_counter() - start
+    cold = UrlCanonicalizer()
+    cold.CACHE_SIZE = 0
+    start = time.perf_counter()
+    cold.canonicalize_many(corpus)
+    cold_elapsed = time.perf_counter() - start
+    warm = UrlCanonicalizer()
+    warm.canonicalize_many(corpus)
+    start = time.perf_counter()
+    warm.canonicalize_many(corpus)
+    warm_elapsed = time.perf_counter() - start
+    print(f"  normalize: {args.links / old_elapsed:,.0f} urls/sec; canonicalize_many: "
+          f"{args.links / cold_elapsed:,.0f} urls/sec uncached, {args.links / warm_elapsed:,.0f} cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""End-to-end crawl benchmark: the full crawler against the local cache-server
+stand-in at several thread counts, reporting pages/sec, p50/p99 per-page latency
+and peak memory.
+
+    python -m benchmarks.bench_crawl --threads 1,2,4,8 --pages 5000 --latency 0.02
+    python -m benchmarks.bench_crawl --replay recorded_web.jsonl
+
+The web has traps, near-duplicates, soft 404s, large pages and faceted search
+pages mixed in (see SyntheticWeb). The server runs in its own process and each
+crawl in a fresh one, so their CPU and memory don't mix and peak RSS is per crawl.
+"""
+import json
+import resource
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+from benchmarks.bench_engines import crawl, make_config
+from benchmarks.cache_server import RecordedWeb, SyntheticWeb
+from crawler.async_worker import AsyncWorker
+from crawler.worker import Worker
+from utils.metrics import metrics
+
+WEB_ARGS = ("pages", "hosts", "traps", "near_duplicates", "soft404s", "large_pages", "facets")
+
+
+def make_web(args):
+    if args.replay:
+        return RecordedWeb(args.replay)
+    return SyntheticWeb(
+        args.pages, args.hosts, traps=args.traps, near_duplicates=args.near_duplicates,
+        soft404s=args.soft404s, large_pages=args.large_pages, facets=args.facets)
+
+
+def start_server(args):
+    """Runs benchmarks.cache_server in a subprocess; returns (process, (host, port))."""
+    command = [sys.executable, "-m", "benchmarks.cache_server", "--port", "0",
+               "--latency", str(args.latency)]
+    if args.replay:
+        command += ["--replay", args.replay]
+    else:
+        for name in WEB_ARGS:
+            command += [f"--{name}", str(getattr(args, name))]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in server.stdout:
+        if "listening on" in line:
+            host, port = line.rsplit(" ", 1)[1].strip().rsplit(":", 1)
+            return server, (host, int(port))
+    raise RuntimeError("cache server stand-in did not start")
+
+
+def run_one(args):
+    """One crawl in this process; prints its result as a JSON line."""
+    web = make_web(args)
+    host, port = args.cache_server.rsplit(":", 1)
+    config = make_config(web, (host, int(port)), args.threads, args.concurrency,
+                         metrics_interval=0)
+    elapsed, completed, _ = crawl(config, AsyncWorker if args.engine == "async" else Worker)
+    page = metrics.histograms["page"]
+    print("RESULT " + json.dumps({
+        "threads": args.threads, "pages": len(completed), "elapsed": elapsed,
+        "p50": page.percentile(0.5), "p99": page.percentile(0.99),
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }), flush=True)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--threads", type=str, default="1,2,4,8")
+    parser.add_argument("--engine", type=str, default="threaded")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--traps", type=float, default=0.02)
+    parser.add_argument("--near_duplicates", type=float, default=0.05)
+    parser.add_argument("--soft404s", type=float, default=0.02)
+    parser.add_argument("--large_pages", type=float, default=0.02)
+    parser.add_argument("--facets", type=float, default=0.02)
+    parser.add_argument("--replay", type=str, default=None)
+    parser.add_argument("--verbose", action="store_true", default=False)
+    # internal: run a single crawl against an already running server
+    parser.add_argument("--cache_server", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.cache_server:
+        args.threads = int(args.threads)
+        run_one(args)
+        return
+
+    server, (host, port) = start_server(args)
+    try:
+        print(f"{'threads':>7} {'pages':>6} {'secs':>7} {'pages/s':>8} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'peak MiB':>9}")
+        for threads in args.threads.split(","):
+            command = [sys.executable, "-m", "benchmarks.bench_crawl",
+                       "--cache_server", f"{host}:{port}", "--threads", threads,
+                       "--engine", args.engine, "--concurrency", str(args.concurrency)]
+            if args.replay:
+                command += ["--replay", args.replay]
+            else:
+                for name in WEB_ARGS:
+                    command += [f"--{name}", str(getattr(args, name))]
+            child = subprocess.run(
+                command, stdout=subprocess.PIPE, text=True, check=True,
+                stderr=None if args.verbose else subprocess.DEVNULL)
+            result = json.loads(child.stdout.split("RESULT ", 1)[1])
+            print(f"{result['threads']:>7} {result['pages']:>6} {result['elapsed']:>7.1f} "
+                  f"{result['pages'] / result['elapsed']:>8.1f} {result['p50'] * 1000:>8.1f} "
+                  f"{result['p99'] * 1000:>8.1f} {result['peak_rss']:>9.0f}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
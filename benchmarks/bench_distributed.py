@@ -0,0 +1,121 @@
+"""Aggregate throughput of a distributed crawl as nodes are added: 1, 2, 4 crawler
+processes splitting the stand-in web by host, with the coordinator stand-in
+routing links between them (see crawler/distributed.py).
+
+    python -m benchmarks.bench_distributed --nodes 1,2,4 --threads 4 --pages 5000
+
+Every node is a separate process with its own threads, frontier and save file.
+The time is the coordinator's, from the moment every node has connected until
+the crawl is over, so process startup is not counted.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+from threading import Thread
+
+from benchmarks.bench_crawl import WEB_ARGS, make_web, start_server
+from benchmarks.bench_engines import make_config
+from crawler import Crawler
+from crawler.distributed import Coordinator, PartitionedFrontier, configure_node
+from utils.metrics import metrics
+
+
+def run_node(args):
+    """One node of the crawl in this process; prints what it did as a JSON line."""
+    web = make_web(args)
+    host, port = args.cache_server.rsplit(":", 1)
+    config = make_config(web, (host, int(port)), args.threads, metrics_interval=0)
+    config.nodes = args.nodes
+    config.node_id = args.node_id
+    host, port = args.coordinator.rsplit(":", 1)
+    config.coordinator = (host, int(port))
+    configure_node(config)
+    os.chdir(args.workdir)
+    Crawler(config, True, frontier_factory=PartitionedFrontier).start()
+    print("RESULT " + json.dumps({
+        "node": args.node_id, "pages": metrics.counters["pages"],
+        "forwarded": metrics.counters["forwarded"],
+    }), flush=True)
+
+
+def run_crawl(args, nodes, cache_server, workdir):
+    """Coordinator in a thread here, nodes in subprocesses. Returns (seconds, node results, report)."""
+    report_file = os.path.join(workdir, "crawl_report.txt")
+    coordinator = Coordinator(nodes, ("127.0.0.1", 0), report_file)
+    thread = Thread(target=coordinator.run)
+    thread.start()
+    host, port = coordinator.address
+    children = list()
+    for node_id in range(nodes):
+        command = [sys.executable, "-m", "benchmarks.bench_distributed",
+                   "--cache_server", f"{cache_server[0]}:{cache_server[1]}",
+                   "--coordinator", f"{host}:{port}", "--nodes", str(nodes),
+                   "--node_id", str(node_id), "--threads", str(args.threads),
+                   "--workdir", workdir]
+        if args.replay:
+            command += ["--replay", args.replay]
+        else:
+            for name in WEB_ARGS:
+                command += [f"--{name}", str(getattr(args, name))]
+        children.append(subprocess.Popen(
+            command, stdout=subprocess.PIPE, text=True,
+            stderr=None if args.verbose else subprocess.DEVNULL))
+    results = list()
+    for child in children:
+        out, _ = child.communicate()
+        results.append(json.loads(out.split("RESULT ", 1)[1]))
+    thread.join()
+    with open(report_file, encoding="utf-8") as f:
+        report = f.read()
+    return coordinator.elapsed, results, report
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--nodes", type=str, default="1,2,4")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--traps", type=float, default=0.02)
+    parser.add_argument("--near_duplicates", type=float, default=0.05)
+    parser.add_argument("--soft404s", type=float, default=0.02)
+    parser.add_argument("--large_pages", type=float, default=0.02)
+    parser.add_argument("--facets", type=float, default=0.02)
+    parser.add_argument("--replay", type=str, default=None)
+    parser.add_argument("--verbose", action="store_true", default=False)
+    # internal: run one node against an already running server and coordinator
+    parser.add_argument("--cache_server", type=str, default=None)
+    parser.add_argument("--coordinator", type=str, default=None)
+    parser.add_argument("--node_id", type=int, default=0)
+    parser.add_argument("--workdir", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.coordinator:
+        args.nodes = int(args.nodes)
+        run_node(args)
+        return
+
+    server, cache_server = start_server(args)
+    try:
+        print(f"{'nodes':>5} {'pages':>6} {'secs':>7} {'pages/s':>8} {'per node':>9} "
+              f"{'forwarded':>9} {'report pages':>12}")
+        for nodes in args.nodes.split(","):
+            nodes = int(nodes)
+            with tempfile.TemporaryDirectory() as workdir:
+                elapsed, results, report = run_crawl(args, nodes, cache_server, workdir)
+            pages = sum(result["pages"] for result in results)
+            forwarded = sum(result["forwarded"] for result in results)
+            # first line of the merged report: "Q1: N unique pages"
+            unique = report.split()[1]
+            print(f"{nodes:>5} {pages:>6} {elapsed:>7.1f} {pages / elapsed:>8.1f} "
+                  f"{pages / elapsed / nodes:>9.1f} {forwarded:>9} {unique:>12}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
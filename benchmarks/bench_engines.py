@@ -0,0 +1,101 @@
+"""Crawl the local cache-server stand-in with the threaded and the async engine,
+report pages/sec for each and check both end with the same frontier and report.
+
+    python -m benchmarks.bench_engines --pages 5000 --latency 0.05 --threads 8
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from benchmarks.cache_server import CacheServer, SyntheticWeb
+from crawler import Crawler
+from crawler.async_worker import AsyncWorker
+from crawler.worker import Worker
+from utils.config import Config
+
+
+def make_config(web, cache_server, threads, concurrency=100, storage="sqlite", **properties):
+    """Config for a crawl of web; extra keyword arguments become [LOCAL PROPERTIES] options."""
+    cparser = ConfigParser()
+    cparser.read_dict({
+        "IDENTIFICATION": {"USERAGENT": "IR benchmark"},
+        "CONNECTION": {"HOST": "127.0.0.1", "PORT": "0"},
+        "CRAWLER": {"SEEDURL": ",".join(web.seed_urls()), "POLITENESS": "0"},
+        "LOCAL PROPERTIES": {
+            "SAVE": "frontier.save", "STORAGE": storage, "THREADCOUNT": str(threads),
+            "ASYNCCONCURRENCY": str(concurrency),
+            **{key.upper().replace("_", ""): str(value) for key, value in properties.items()}},
+    })
+    config = Config(cparser)
+    config.cache_server = cache_server
+    return config
+
+
+def crawl(config, worker_factory):
+    """Runs a full crawl in a fresh directory; returns (seconds, completed urls, report)."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            crawler = Crawler(config, True, worker_factory=worker_factory)
+            start = time.perf_counter()
+            crawler.start()
+            elapsed = time.perf_counter() - start
+            save = crawler.frontier.save.__class__(config.save_file, 100, 0)
+            completed = {url for url, done in save.values() if done}
+            save.close()
+            with open("crawl_report.txt", encoding="utf-8") as f:
+                report = f.read()
+        finally:
+            os.chdir(cwd)
+    return elapsed, completed, report
+
+
+def report_counts(report):
+    """The counts in a crawl report, without the choices made between ties.
+
+    Which of two equally long pages is the longest, and the order (or, at the
+    50th place, the choice) of words with the same count, depend on the order
+    pages finished in; so keep the longest page's word count, the top word
+    counts, and only the words counted more often than the 50th."""
+    sections = report.split("\n\n")
+    unique_pages = sections[0]
+    longest_words = sections[1].rsplit(" with ", 1)[-1]
+    top = [line.rsplit(": ", 1) for line in sections[3].splitlines() if line]
+    counts = [int(count) for _, count in top]
+    cutoff = min(counts, default=0)
+    above_cutoff = {word: int(count) for word, count in top if int(count) > cutoff}
+    subdomains = sections[5] if len(sections) > 5 else ""
+    return unique_pages, longest_words, counts, above_cutoff, subdomains
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    args = parser.parse_args()
+
+    web = SyntheticWeb(args.pages, args.hosts)
+    server = CacheServer(web, latency=args.latency)
+    cache_server = server.start_in_thread()
+    results = dict()
+    for name, factory, threads in (
+            ("threaded", Worker, args.threads), ("async", AsyncWorker, 1)):
+        config = make_config(web, cache_server, threads, args.concurrency)
+        elapsed, completed, report = crawl(config, factory)
+        results[name] = (completed, report)
+        print(f"{name:>8}: {len(completed)} pages in {elapsed:.1f}s "
+              f"= {len(completed) / elapsed:.0f} pages/sec")
+    server.stop()
+    same_frontier = results["threaded"][0] == results["async"][0]
+    same_report = report_counts(results["threaded"][1]) == report_counts(results["async"][1])
+    print(f"same frontier state: {same_frontier}, same report: {same_report}")
+
+
+if __name__ == "__main__":
+    main()
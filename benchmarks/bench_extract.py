@@ -0,0 +1,106 @@
+"""Pages/sec and peak RSS of the html extraction backends, plus a parity check
+that the streaming backend finds the same tokens, title and links as bs4.
+
+    python -m benchmarks.bench_extract --pages_dir saved_pages/
+    python -m benchmarks.bench_extract --synthetic 500
+
+Each backend is timed in its own subprocess so peak RSS is measured separately.
+"""
+import glob
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+from utils.html_extract import EXTRACTORS
+
+
+def synthetic_pages(count, seed=0):
+    """Pages with scripts, styles, noscript links and a large body, like real ics.uci.edu pages."""
+    rng = random.Random(seed)
+    words = ["research", "faculty", "student", "course", "graph", "learning", "systems",
+             "the", "and", "of", "data", "informatics", "software", "security", "vision"]
+    pages = list()
+    for i in range(count):
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(200, 20000)))
+        links = "".join(f'<li><a href="/p/{rng.randrange(10**6)}">link &amp; more</a></li>'
+                        for _ in range(rng.randint(10, 300)))
+        pages.append((
+            f"<!DOCTYPE html><html><head><title>Page {i} &ndash; ICS</title>"
+            f'<meta charset="utf-8"><style>body {{ color: red }}</style>'
+            f"<script>var x = '<a href=\"/nope\">';</script></head>"
+            f"<body><noscript><a href='/noscript'>enable js</a></noscript>"
+            f"<!-- comment text --><p>{body}</p><ul>{links}</ul></body></html>").encode("utf-8"))
+    return pages
+
+
+def load_pages(pages_dir, synthetic):
+    if pages_dir:
+        pages = list()
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*"))):
+            with open(path, "rb") as f:
+                pages.append(f.read())
+        return pages
+    return synthetic_pages(synthetic)
+
+
+def tokens(text):
+    return [w for w in re.split(r"[^a-zA-Z]+", text.lower()) if len(w) >= 2]
+
+
+def run_backend(backend, pages):
+    extractor = EXTRACTORS[backend]
+    start = time.perf_counter()
+    for content in pages:
+        extractor(content)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    mb = sum(len(p) for p in pages) / 2**20
+    print(f"{backend:>7}: {len(pages) / elapsed:8.1f} pages/sec, {mb / elapsed:6.1f} MiB/sec, "
+          f"peak RSS {peak_mb:.0f} MiB")
+
+
+def parity(pages):
+    mismatches = 0
+    for i, content in enumerate(pages):
+        reference, streamed = EXTRACTORS["bs4"](content), EXTRACTORS["stream"](content)
+        problems = list()
+        if tokens(reference.text) != tokens(streamed.text):
+            problems.append("tokens")
+        if (reference.title or "").strip() != (streamed.title or "").strip():
+            problems.append("title")
+        if set(h.strip() for h in reference.hrefs) != set(h.strip() for h in streamed.hrefs):
+            problems.append("hrefs")
+        if problems:
+            mismatches += 1
+            print(f"  page {i}: {', '.join(problems)} differ")
+    print(f"parity: {len(pages) - mismatches}/{len(pages)} pages identical")
+    return mismatches == 0
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages_dir", type=str, default=None)
+    parser.add_argument("--synthetic", type=int, default=300)
+    parser.add_argument("--backend", type=str, default=None)
+    args = parser.parse_args()
+    pages = load_pages(args.pages_dir, args.synthetic)
+
+    if args.backend:
+        run_backend(args.backend, pages)
+        return
+    for backend in EXTRACTORS:
+        command = [sys.executable, "-m", "benchmarks.bench_extract", "--backend", backend,
+                   "--synthetic", str(args.synthetic)]
+        if args.pages_dir:
+            command += ["--pages_dir", args.pages_dir]
+        subprocess.run(command, check=True)
+    sys.exit(0 if parity(pages) else 1)
+
+
+if __name__ == "__main__":
+    main()
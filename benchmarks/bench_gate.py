@@ -0,0 +1,99 @@
+"""Per-page latency and peak memory of Scraper.extract_next_links with and without
+the response gate (utils/gate.py), on a mix of synthetic pages, binary files
+(pdfs, zips, images; some of them mislabelled as text/html), multi-megabyte
+generated pages and exact copies of earlier pages at other urls.
+
+    python -m benchmarks.bench_gate --pages 2000 --binaries 0.1 --huge 0.02 --copies 0.1
+
+Without the gate every 200 response is parsed and tokenized in full, as
+before; with it, the rejections are listed by reason.
+"""
+import random
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+from benchmarks.bench_engines import make_config
+from benchmarks.cache_server import SyntheticWeb
+from scraper import Scraper
+from utils import get_logger
+
+BINARY_HEADERS = (b"%PDF-1.4\n", b"PK\x03\x04", b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff\xe0")
+BINARY_TYPES = ("application/pdf", "application/zip", "image/png", "image/jpeg")
+
+
+def make_responses(web, pages, binaries, huge, copies, huge_bytes, seed=0):
+    """Returns [(url, response)] in crawl order."""
+    rng = random.Random(seed)
+    responses = list()
+    for i in range(pages):
+        url = web.url(i)
+        content_type = "text/html; charset=utf-8"
+        x = rng.random()
+        if x < binaries:
+            kind = rng.randrange(len(BINARY_HEADERS))
+            content = BINARY_HEADERS[kind] + rng.randbytes(rng.randrange(50000, 500000))
+            # servers often send files as text/html
+            content_type = rng.choice((BINARY_TYPES[kind], "text/html"))
+        elif x < binaries + huge:
+            # a generated listing: the same page repeated until it is huge
+            page = web.render(i)
+            content = page * (huge_bytes // len(page))
+        elif x < binaries + huge + copies and i > 0:
+            content = web.render(rng.randrange(i))
+        else:
+            content = web.render(i)
+        raw = SimpleNamespace(content=content, headers={"Content-Type": content_type})
+        responses.append((url, SimpleNamespace(url=url, status=200, raw_response=raw)))
+    return responses
+
+
+def run(web, responses, gated, logger):
+    """Returns (sorted per-page seconds, scraper)."""
+    config = make_config(web, ("127.0.0.1", 0), 1)
+    config.parser = "stream"
+    config.canonicalize_rules = {"hostaliases": "false"}
+    scraper = Scraper(config, logger)
+    if not gated:
+        scraper.gate.admit = lambda url, resp, dedupe=True: (resp.raw_response.content, None)
+    latencies = list()
+    for url, resp in responses:
+        start = time.perf_counter()
+        scraper.extract_next_links(url, resp)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), scraper
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--binaries", type=float, default=0.1)
+    parser.add_argument("--huge", type=float, default=0.02)
+    parser.add_argument("--copies", type=float, default=0.1)
+    parser.add_argument("--huge_bytes", type=int, default=8000000)
+    args = parser.parse_args()
+    web = SyntheticWeb(args.pages, 20)
+    responses = make_responses(web, args.pages, args.binaries, args.huge, args.copies, args.huge_bytes)
+    megabytes = sum(len(resp.raw_response.content) for _, resp in responses) / 1e6
+    print(f"{args.pages} responses, {megabytes:.0f} MB")
+    logger = get_logger("BENCH")
+
+    print(f"{'gate':>4} {'secs':>6} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'peak MB':>8} {'pages':>6}")
+    for gated in (False, True):
+        latencies, scraper = run(web, responses, gated, logger)
+        # a second pass for the memory peak, since tracing slows everything down
+        tracemalloc.start()
+        run(web, responses, gated, logger)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        scraper.analytics.flush()
+        print(f"{'on' if gated else 'off':>4} {sum(latencies):>6.1f} "
+              f"{latencies[len(latencies) // 2] * 1e3:>7.2f} {latencies[int(len(latencies) * 0.99)] * 1e3:>7.2f} "
+              f"{latencies[-1] * 1e3:>7.1f} {peak / 1e6:>8.1f} {scraper.analytics.unique_pages:>6}")
+    summary = scraper.gate.summary(5)
+    print(f"rejected: {summary['rejected']}, truncated: {summary['truncated']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Cost of a log call in the crawler's threads: the old handlers (a FileHandler
+and a StreamHandler per logger, formatting and writing in the calling thread)
+against the queued writer of utils/logs.py, and the per-fetch access log in
+full, sampled and turned off. Console output goes to /dev/null for both.
+
+    python -m benchmarks.bench_logging --threads 1,4,8 --calls 20000
+
+"call us" is the time a thread spends per log call; "on disk" is the time
+until every line is written, which for the queued writer includes draining
+its queue after the threads are done.
+"""
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from threading import Thread
+
+from utils import get_logger
+from utils.logs import AccessLog, configure_logging, log_writer, FORMAT
+
+URL = "https://www.ics.uci.edu/~user/research/projects/index.html"
+CACHE = ("styx.ics.uci.edu", 9000)
+
+
+def old_logger(name, filename, console):
+    """What utils.get_logger used to set up, on every call."""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    fh = logging.FileHandler(f"Logs/{filename}.log")
+    fh.setLevel(logging.DEBUG)
+    ch = logging.StreamHandler(console)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(FORMAT)
+    fh.setFormatter(formatter)
+    ch.setFormatter(formatter)
+    logger.addHandler(fh)
+    logger.addHandler(ch)
+    return logger
+
+
+def run(threads, calls, log_call):
+    """log_call(worker_id, i) `calls` times in each of `threads` threads.
+    Returns (seconds until the threads are done, seconds until the lines are written)."""
+    def loop(worker_id):
+        for i in range(calls):
+            log_call(worker_id, i)
+    workers = [Thread(target=loop, args=(worker_id,)) for worker_id in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    # a no-op for the old handlers, which wrote every line before returning
+    log_writer.flush()
+    return elapsed, time.perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--threads", type=str, default="1,4,8")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    console = open(os.devnull, "w")
+    configure_logging(console=console)
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("Logs", exist_ok=True)
+
+    print(f"{'logging':>18} {'threads':>7} {'call us':>8} {'on disk s':>9}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        old = [old_logger(f"Old-{threads}-{i}", "Old", console) for i in range(threads)]
+        new = [get_logger(f"New-{threads}-{i}", "New") for i in range(threads)]
+        logs = {sample: AccessLog(f"Logs/access.{sample}.jsonl", sample) for sample in (1, 0.1, 0)}
+        cases = [
+            ("old handlers", lambda w, i: old[w].info(
+                f"Downloaded {URL}?page={i}, status <200>, using cache {CACHE}.")),
+            ("queued", lambda w, i: new[w].info(
+                "Downloaded %s?page=%d, status <%d>, using cache %s.", URL, i, 200, CACHE)),
+        ] + [
+            (f"access log {sample:g}", lambda w, i, log=log: log.record(
+                f"{URL}?page={i}", 200, 0.0123, 45678, w))
+            for sample, log in logs.items()]
+        for name, log_call in cases:
+            elapsed, on_disk = run(threads, args.calls, log_call)
+            # each thread's own time per call: the threads share one interpreter
+            print(f"{name:>18} {threads:>7} {elapsed / args.calls * 1e6:>8.2f} {on_disk:>9.2f}")
+        for logger in old:
+            for handler in logger.handlers:
+                handler.close()
+
+
+if __name__ == "__main__":
+    main()
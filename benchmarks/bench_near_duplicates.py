@@ -0,0 +1,102 @@
+"""Compare the MinHash/LSH near-duplicate index with the old exact-Jaccard scan.
+
+Generates synthetic pages where every `--dup_every`-th page is a lightly edited
+copy of an earlier one, then reports recall (edited copies caught) and mean
+per-page latency for both paths.
+
+    python -m benchmarks.bench_near_duplicates --sizes 10000,100000,1000000
+"""
+import random
+import time
+from argparse import ArgumentParser
+
+from utils.minhash import MinHashLSH, shingle_hashes
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+
+
+def make_corpus(size, page_tokens, dup_every, edits, seed):
+    """Yield (tokens, is_duplicate) pairs."""
+    rng = random.Random(seed)
+    originals = []
+    for i in range(size):
+        if originals and i % dup_every == 0:
+            tokens = list(rng.choice(originals))
+            for _ in range(edits):
+                tokens[rng.randrange(len(tokens))] = rng.choice(VOCABULARY)
+            yield tokens, True
+        else:
+            tokens = [rng.choice(VOCABULARY) for _ in range(page_tokens)]
+            # only keep a bounded sample of originals to copy from
+            if len(originals) < 1000:
+                originals.append(tokens)
+            else:
+                originals[rng.randrange(1000)] = tokens
+            yield tokens, False
+
+
+class ExactIndex:
+    """The pre-LSH implementation: compare against every stored shingle set."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.signatures = set()
+
+    def check_and_insert(self, tokens):
+        phrases = frozenset(shingle_hashes(tokens))
+        for sig in self.signatures:
+            in_either = len(phrases | sig)
+            if in_either and len(phrases & sig) / in_either >= self.threshold:
+                return True
+        self.signatures.add(phrases)
+        return False
+
+
+class LSHIndex:
+    def __init__(self, threshold):
+        self.lsh = MinHashLSH(threshold=threshold)
+
+    def check_and_insert(self, tokens):
+        return self.lsh.check_and_insert(self.lsh.hasher.signature(shingle_hashes(tokens)))
+
+
+def run(index, corpus):
+    caught = dups = false_positives = 0
+    start = time.perf_counter()
+    for tokens, is_duplicate in corpus:
+        flagged = index.check_and_insert(tokens)
+        if is_duplicate:
+            dups += 1
+            caught += flagged
+        else:
+            false_positives += flagged
+    elapsed = time.perf_counter() - start
+    return caught / dups if dups else 1.0, false_positives, elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="10000,100000,1000000")
+    parser.add_argument("--page_tokens", type=int, default=200)
+    parser.add_argument("--dup_every", type=int, default=10)
+    parser.add_argument("--edits", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    # the exact scan is quadratic; past this size it would take days, so skip it
+    parser.add_argument("--exact_limit", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'pages':>9} {'method':>6} {'recall':>7} {'false+':>7} {'us/page':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        methods = [("lsh", LSHIndex)]
+        if size <= args.exact_limit:
+            methods.append(("exact", ExactIndex))
+        for name, factory in methods:
+            corpus = make_corpus(size, args.page_tokens, args.dup_every, args.edits, args.seed)
+            recall, false_positives, elapsed = run(factory(args.threshold), corpus)
+            print(f"{size:>9} {name:>6} {recall:>7.3f} {false_positives:>7} "
+                  f"{elapsed / size * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
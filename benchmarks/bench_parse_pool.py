@@ -0,0 +1,43 @@
+"""Scaling of the process-pool parsing stage across cores, against the local
+cache-server stand-in with large pages so the crawl is parse-bound.
+
+    python -m benchmarks.bench_parse_pool --cores 1,2,4,8 --pages 2000
+
+"0" in --cores means parsing in the worker threads (no pool), for reference.
+"""
+from argparse import ArgumentParser
+
+from benchmarks.bench_engines import crawl, make_config
+from benchmarks.cache_server import CacheServer, SyntheticWeb
+from crawler.worker import Worker
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--cores", type=str, default="0,1,2,4,8")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--words_per_page", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--parser", type=str, default="bs4")
+    args = parser.parse_args()
+
+    web = SyntheticWeb(args.pages, args.hosts, words_per_page=args.words_per_page)
+    server = CacheServer(web, latency=args.latency)
+    cache_server = server.start_in_thread()
+    baseline = None
+    for cores in (int(c) for c in args.cores.split(",")):
+        # twice as many download threads as parsers keeps every parser busy
+        config = make_config(
+            web, cache_server, threads=max(2, 2 * cores), parse_processes=cores)
+        config.parser = args.parser
+        elapsed, completed, _ = crawl(config, Worker)
+        rate = len(completed) / elapsed
+        baseline = baseline or rate
+        print(f"{cores} parse processes: {len(completed)} pages in {elapsed:.1f}s = "
+              f"{rate:.1f} pages/sec ({rate / baseline:.2f}x)")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Unique pages collected within a fixed fetch budget, for the frontier's old
+depth-first (lifo) order and the best-first order of crawler/priority.py: an
+in-process crawl of the synthetic web through Frontier and Scraper (no server,
+no politeness delay), with the trap detector off and on.
+
+    python -m benchmarks.bench_priority --pages 20000 --budget 5000
+
+Pages in the report are the useful fetches; calendar and search pages,
+near-duplicates, soft 404s and links to pages that don't exist are the rest.
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from types import SimpleNamespace
+
+from benchmarks.bench_engines import make_config
+from benchmarks.cache_server import SyntheticWeb
+from crawler.frontier import Frontier
+from utils.robots import RobotsCache
+
+
+def crawl(web, order, adaptive, budget):
+    """Returns (Counter of fetches by kind of url, pages in the report, seconds)."""
+    config = make_config(web, ("127.0.0.1", 0), 1)
+    config.parser = "stream"
+    config.priority_rules = {"order": order}
+    config.trap_rules = {"adaptive": str(adaptive)}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            frontier = Frontier(config, True)
+            scraper = frontier.scraper
+            scraper.robots.allowed = lambda url: True
+            fetches = Counter()
+            start = time.perf_counter()
+            while sum(fetches.values()) < budget:
+                url = frontier.get_tbd_url()
+                if url is None:
+                    break
+                if scraper.is_trap(url):
+                    frontier.mark_url_complete(url)
+                    continue
+                status, body, _ = web.respond(url)
+                fetches[url.split("/")[3]] += 1
+                resp = SimpleNamespace(
+                    url=url, status=status, raw_response=SimpleNamespace(content=body) if body else None)
+                for link in scraper.scraper(url, resp):
+                    frontier.add_url(link, url)
+                frontier.mark_url_complete(url)
+            elapsed = time.perf_counter() - start
+            frontier.close()
+            pages = scraper.analytics.unique_pages
+        finally:
+            os.chdir(cwd)
+    return fetches, pages, elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--budget", type=int, default=5000)
+    parser.add_argument("--traps", type=float, default=0.05)
+    parser.add_argument("--facets", type=float, default=0.05)
+    parser.add_argument("--near_duplicates", type=float, default=0.05)
+    parser.add_argument("--soft404s", type=float, default=0.02)
+    args = parser.parse_args()
+    web = SyntheticWeb(
+        args.pages, args.hosts, traps=args.traps, near_duplicates=args.near_duplicates,
+        soft404s=args.soft404s, facets=args.facets)
+    # the synthetic web has no robots.txt; don't start fetching them from a server that isn't there
+    RobotsCache.prefetch = lambda self, url: None
+
+    print(f"{'order':>9} {'traps':>5} {'fetches':>8} {'pages':>6} {'yield':>6} {'calendar':>9} "
+          f"{'search':>7} {'secs':>6}")
+    for adaptive in (False, True):
+        for order in ("lifo", "bestfirst"):
+            fetches, pages, elapsed = crawl(web, order, adaptive, args.budget)
+            total = sum(fetches.values())
+            print(f"{order:>9} {'on' if adaptive else 'off':>5} {total:>8} {pages:>6} "
+                  f"{pages / max(1, total):>6.1%} {fetches['calendar']:>9} {fetches['search']:>7} "
+                  f"{elapsed:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
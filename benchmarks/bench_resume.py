@@ -0,0 +1,94 @@
+"""Startup time of a resumed crawl from a large save file, old way against new.
+
+    python -m benchmarks.bench_resume --urls 1000000 --pending 0.1
+
+"old" is the startup before the pending index: read every record back, rebuild
+the seen urls, run the full is_valid (robots.txt included, fetched from the local
+stand-in server) on each pending url. "new" is Frontier(config, restart=False),
+with and without the seen-url snapshot (a crawl that was killed has none).
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.bench_engines import make_config
+from benchmarks.cache_server import CacheServer, SyntheticWeb
+from crawler.frontier import Frontier
+from crawler.storage import get_storage_class
+from scraper import Scraper
+from utils import get_logger, get_urlhash, get_urlfingerprint
+from utils.seen import SeenUrlSet
+
+
+def build_save_file(config, web, urls, pending):
+    """Save file with `urls` records, the first `pending` fraction not completed; plus a seen snapshot."""
+    save = get_storage_class(config.storage)(config.save_file, 10000, 0)
+    seen = SeenUrlSet(initial_capacity=2 * urls)
+    cutoff = int(urls * pending)
+    for i in range(urls):
+        url = web.url(i)
+        urlhash = get_urlhash(url)
+        save[urlhash] = (url, i >= cutoff)
+        seen.add(get_urlfingerprint(url, urlhash))
+    seen.save(config.save_file + ".seen", tag=len(save))
+    save.close()
+
+
+def old_startup(config):
+    save = get_storage_class(config.storage)(config.save_file, 100, 0)
+    scraper = Scraper(config, get_logger("BENCH"))
+    seen = SeenUrlSet()
+    tbd_count = 0
+    for urlhash, (url, completed) in save.items():
+        seen.add(get_urlfingerprint(url, urlhash))
+        if not completed and scraper.is_valid(url):
+            tbd_count += 1
+    save.close()
+    return tbd_count
+
+
+def new_startup(config):
+    frontier = Frontier(config, False)
+    tbd_count = len(frontier.to_be_downloaded)
+    frontier.save.close()
+    return tbd_count
+
+
+def timed(name, startup, config):
+    start = time.perf_counter()
+    tbd_count = startup(config)
+    print(f"{name:>20}: {time.perf_counter() - start:7.2f}s, {tbd_count} urls to download")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--pending", type=float, default=0.1)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--storage", type=str, default="sqlite")
+    args = parser.parse_args()
+
+    web = SyntheticWeb(args.urls, args.hosts)
+    server = CacheServer(web, latency=args.latency)
+    config = make_config(web, server.start_in_thread(), 1, storage=args.storage)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            start = time.perf_counter()
+            build_save_file(config, web, args.urls, args.pending)
+            print(f"built a {args.urls}-url {args.storage} save file "
+                  f"in {time.perf_counter() - start:.1f}s")
+            timed("old", old_startup, config)
+            timed("new", new_startup, config)
+            os.remove(config.save_file + ".seen")
+            timed("new, no snapshot", new_startup, config)
+        finally:
+            os.chdir(cwd)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Memory per url and lookups/sec of the seen-url set against a plain set of urls.
+
+    python -m benchmarks.bench_seen --counts 1000000 10000000
+
+Half of the timed lookups are for urls that were added, half for urls that were not,
+since a crawl mostly asks about new links.
+"""
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+from utils import get_urlfingerprint
+from utils.seen import SeenUrlSet
+
+
+def make_url(i):
+    return f"https://www.ics.uci.edu/~user{i % 5000}/pages/{i}.html?session={i * 7919}"
+
+
+def bench(count, lookups, seed=0):
+    seen = SeenUrlSet()
+    start = time.perf_counter()
+    for i in range(count):
+        seen.add(get_urlfingerprint(make_url(i)))
+    insert_elapsed = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    probes = [get_urlfingerprint(make_url(rng.randrange(2 * count))) for _ in range(lookups)]
+    start = time.perf_counter()
+    hits = sum(1 for fp in probes if fp in seen)
+    lookup_elapsed = time.perf_counter() - start
+
+    # a plain set of the url strings, measured on a sample and scaled up
+    sample = min(count, 100000)
+    urls = {make_url(i) for i in range(sample)}
+    set_bytes = sys.getsizeof(urls) + sum(sys.getsizeof(u) for u in urls)
+    set_bytes_per_url = set_bytes / sample
+
+    print(f"{count:>10} urls: {seen.nbytes / count:5.1f} bytes/url "
+          f"(set of url strings: {set_bytes_per_url:.0f}), "
+          f"{count / insert_elapsed:8.0f} inserts/sec, "
+          f"{lookups / lookup_elapsed:8.0f} lookups/sec, {hits}/{lookups} hits")
+    assert len(seen) == count
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+    for count in args.counts:
+        bench(count, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""URLs/sec added to the frontier save file under each storage backend, plus a
+crash-consistency check that SIGKILLs a writer mid-crawl and reopens the file.
+
+    python -m benchmarks.bench_storage --urls 20000
+    python -m benchmarks.bench_storage --crash --storage sqlite
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from crawler.storage import STORAGE_BACKENDS, get_storage_class
+from utils import get_urlhash
+
+
+def fake_url(i):
+    return f"https://www.ics.uci.edu/page/{i}"
+
+
+def bench(name, count, flush_count, flush_interval, outlinks):
+    """Mimics the frontier: `outlinks` add_url writes per mark_url_complete write."""
+    storage_class = get_storage_class(name)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frontier.save")
+        save = storage_class(path, flush_count, flush_interval)
+        start = time.perf_counter()
+        for i in range(count):
+            url = fake_url(i)
+            save[get_urlhash(url)] = (url, False)
+            if i % outlinks == 0:
+                save[get_urlhash(url)] = (url, True)
+        save.close()
+        return count / (time.perf_counter() - start)
+
+
+def crash_writer(name, path, flush_count):
+    """Child process: writes forever, printing how many urls are known to be flushed."""
+    save = get_storage_class(name)(path, flush_count, 0)
+    i = 0
+    while True:
+        url = fake_url(i)
+        save[get_urlhash(url)] = (url, False)
+        i += 1
+        if i % flush_count == 0:
+            # every write up to i has been handed to the backend in a batch
+            print(i, flush=True)
+
+
+def crash_check(name, flush_count, run_seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frontier.save")
+        child = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_storage", "--crash_writer",
+             "--storage", name, "--path", path, "--flush_count", str(flush_count)],
+            stdout=subprocess.PIPE, text=True)
+        time.sleep(run_seconds)
+        child.send_signal(signal.SIGKILL)
+        acknowledged = [int(line) for line in child.stdout.read().split()]
+        child.wait()
+        flushed = acknowledged[-1] if acknowledged else 0
+
+        save = get_storage_class(name)(path, flush_count, 0)
+        missing = [i for i in range(flushed) if get_urlhash(fake_url(i)) not in save]
+        stored = len(save)
+        corrupt = sum(1 for url, completed in save.values()
+                      if not url.startswith("https://") or completed)
+        save.close()
+        ok = not missing and not corrupt and stored >= flushed
+        print(f"{name}: killed after {flushed} flushed urls, {stored} stored, "
+              f"{len(missing)} missing, {corrupt} corrupt -> {'OK' if ok else 'FAILED'}")
+        return ok
+
+
+def main():
+    parser = ArgumentParser()
+    # default: every backend for throughput, sqlite only for --crash since
+    # shelve makes no crash-consistency promise
+    parser.add_argument("--storage", type=str, default=None)
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--outlinks", type=int, default=50)
+    parser.add_argument("--flush_count", type=int, default=100)
+    parser.add_argument("--flush_interval", type=float, default=0.5)
+    parser.add_argument("--crash", action="store_true", default=False)
+    parser.add_argument("--crash_seconds", type=float, default=2.0)
+    parser.add_argument("--crash_writer", action="store_true", default=False)
+    parser.add_argument("--path", type=str)
+    args = parser.parse_args()
+
+    if args.crash_writer:
+        crash_writer(args.storage, args.path, args.flush_count)
+        return
+    names = (args.storage or ("sqlite" if args.crash else ",".join(STORAGE_BACKENDS))).split(",")
+    if args.crash:
+        ok = all([crash_check(name, args.flush_count, args.crash_seconds) for name in names])
+        sys.exit(0 if ok else 1)
+    for name in names:
+        unbatched = bench(name, min(args.urls, 2000), 1, 0, args.outlinks)
+        batched = bench(name, args.urls, args.flush_count, args.flush_interval, args.outlinks)
+        print(f"{name}: {unbatched:10.0f} urls/sec synced per write, "
+              f"{batched:10.0f} urls/sec batched by {args.flush_count}")
+
+
+if __name__ == "__main__":
+    main()
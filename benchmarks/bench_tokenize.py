@@ -0,0 +1,73 @@
+"""Tokens/sec of page tokenizing and counting: the old five-pass pipeline against
+utils.tokenize.count_tokens, on large synthetic pages (200 to 20000 words). Checks both give the same counts.
+
+    python -m benchmarks.bench_tokenize --pages 200
+"""
+import re
+import time
+import zlib
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+
+from benchmarks.bench_extract import synthetic_pages
+from scraper import Scraper
+from utils.html_extract import extract
+from utils.tokenize import count_tokens
+
+
+def old_pipeline(text, word_frequencies, shingle=True):
+    """Tokenize, filter, shingle and count the way analyze_page and the analytics did before."""
+    raw = re.split(r"[^a-zA-Z]+", text.lower())
+    tokens = [w for w in raw if len(w) >= 2]
+    n = len(tokens)
+    stop = sum(1 for t in tokens if t in Scraper.STOPWORDS)
+    distinct = len(set(tokens))
+    shingles = {
+        zlib.crc32(" ".join(tokens[i : i + 4]).encode("utf-8"))
+        for i in range(len(tokens) - 3)
+    } if shingle else None
+    page_counts = defaultdict(int)
+    for t in tokens:
+        if t not in Scraper.STOPWORDS:
+            page_counts[t] += 1
+    for word, count in page_counts.items():
+        word_frequencies[word] += count
+    return n, stop, distinct, shingles
+
+
+def new_pipeline(text, word_frequencies, shingle=True):
+    stats = count_tokens(text, Scraper.STOPWORDS, 4 if shingle else None)
+    word_frequencies.update(stats.counts)
+    return stats.total, stats.stopwords, stats.distinct, stats.shingles
+
+
+def run(name, pipeline, texts, word_frequencies, shingle):
+    tokens = 0
+    results = list()
+    start = time.perf_counter()
+    for text in texts:
+        result = pipeline(text, word_frequencies, shingle)
+        tokens += result[0]
+        results.append(result)
+    elapsed = time.perf_counter() - start
+    label = name + (" + shingles" if shingle else "")
+    print(f"{label:>14}: {tokens / elapsed / 1e6:6.2f}M tokens/sec ({tokens} tokens, {elapsed:.2f}s)")
+    return results
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+    texts = [extract(page, "stream").text for page in synthetic_pages(args.pages)]
+
+    for shingle in (False, True):
+        old_counts, new_counts = defaultdict(int), Counter()
+        old = run("old", old_pipeline, texts, old_counts, shingle)
+        new = run("new", new_pipeline, texts, new_counts, shingle)
+        if old != new or dict(old_counts) != dict(new_counts):
+            print("  counts or shingles differ!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Fetches spent on traps with and without the adaptive trap detector
+(utils/traps.py): a breadth-first crawl of the synthetic web with calendar traps
+and faceted search pages, run in-process through Scraper (no server, no
+politeness), counting what each fetch turned out to be.
+
+    python -m benchmarks.bench_traps --pages 5000 --traps 0.05 --facets 0.05
+
+Pages that make it into the report are the useful fetches; calendar and
+search pages fetched after the first few of each template are the waste the
+detector should cut.
+"""
+import time
+from argparse import ArgumentParser
+from collections import Counter, deque
+from types import SimpleNamespace
+
+from benchmarks.bench_engines import make_config
+from benchmarks.cache_server import SyntheticWeb
+from scraper import Scraper
+from utils import get_logger
+
+
+def crawl(web, adaptive, logger):
+    """Returns (Counter of fetches by kind of url, pages in the report, seconds, trap summary)."""
+    config = make_config(web, ("127.0.0.1", 0), 1)
+    config.parser = "stream"
+    config.trap_rules = {"adaptive": str(adaptive)}
+    scraper = Scraper(config, logger)
+    # the synthetic web has no robots.txt; don't start fetching them from a server that isn't there
+    scraper.robots.allowed = lambda url: True
+    queue = deque(scraper.canonicalizer.canonicalize(url) for url in web.seed_urls())
+    seen = set(queue)
+    fetches = Counter()
+    start = time.perf_counter()
+    while queue:
+        url = queue.popleft()
+        if scraper.is_trap(url):
+            continue
+        status, body, _ = web.respond(url)
+        fetches[url.split("/")[3]] += 1
+        resp = SimpleNamespace(
+            url=url, status=status, raw_response=SimpleNamespace(content=body) if body else None)
+        for link in scraper.scraper(url, resp):
+            link = scraper.canonicalizer.canonicalize(link)
+            if link not in seen:
+                seen.add(link)
+                queue.append(link)
+    elapsed = time.perf_counter() - start
+    scraper.analytics.flush()
+    return fetches, scraper.analytics.unique_pages, elapsed, scraper.traps.summary(5)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--traps", type=float, default=0.05)
+    parser.add_argument("--facets", type=float, default=0.05)
+    parser.add_argument("--near_duplicates", type=float, default=0.05)
+    parser.add_argument("--soft404s", type=float, default=0.02)
+    args = parser.parse_args()
+    web = SyntheticWeb(
+        args.pages, args.hosts, traps=args.traps, near_duplicates=args.near_duplicates,
+        soft404s=args.soft404s, facets=args.facets)
+
+    print(f"{'detector':>8} {'fetches':>8} {'pages':>6} {'calendar':>9} {'search':>7} "
+          f"{'wasted':>7} {'secs':>6}")
+    logger = get_logger("BENCH")
+    for adaptive in (False, True):
+        fetches, pages, elapsed, summary = crawl(web, adaptive, logger)
+        total = sum(fetches.values())
+        print(f"{'on' if adaptive else 'off':>8} {total:>8} {pages:>6} {fetches['calendar']:>9} "
+              f"{fetches['search']:>7} {total - pages:>7} {elapsed:>6.1f}")
+    print(f"templates: {summary['templates']}, throttled: {summary['throttled']}, "
+          f"blacklisted: {summary['blacklisted']}")
+    for template, verdict in summary["top"].items():
+        print(f"  {template}: {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""URLs/sec of the compiled UrlFilter against the old chain of re calls in
+Scraper.is_valid (robots.txt excluded from both), on a synthetic corpus shaped
+like the links found on ics.uci.edu pages. Also checks both agree on every url.
+
+    python -m benchmarks.bench_url_filter --urls 200000
+"""
+import random
+import re
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from urllib.parse import urlparse
+
+from utils.url_filter import UrlFilter
+
+ALLOWED_HOST_SUFFIXES = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu")
+
+
+def old_is_valid(url):
+    """Scraper.is_valid before the compiled filter, minus the robots.txt check."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        return False
+    if "date=" in url.lower():
+        return False
+    host = parsed.netloc.lower()
+    if not (host in ALLOWED_HOST_SUFFIXES or any(host.endswith("." + s) for s in ALLOWED_HOST_SUFFIXES)):
+        return False
+    if host == "archive.ics.uci.edu":
+        return False
+    if re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4|mpg"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1"
+        + r"|thmx|mso|arff|rtf|jar|csv"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
+        return False
+    path_lower = parsed.path.lower()
+    query_lower = parsed.query.lower()
+    if re.search(r"/\d{4}/\d{1,2}/\d{1,2}(/|$)", path_lower):
+        return False
+    if re.search(r"\d{8}(-\d+)?", path_lower):
+        return False
+    if re.search(r"/-/commit/[0-9a-f]{32,40}", path_lower) or re.search(r"/commit/[0-9a-f]{32,40}", path_lower):
+        return False
+    if re.search(r"/events?/", path_lower):
+        return False
+    for fragment in ("/pix", "/bibs/"):
+        if fragment in path_lower:
+            return False
+    if "version=" in query_lower or "from=" in query_lower:
+        return False
+    if ".php" in path_lower and "http" in query_lower:
+        return False
+    if "share=" in query_lower:
+        return False
+    if re.search(r"/(login|signin|sign-in|wp-login|user/login|auth)(/|$|\?)", path_lower):
+        return False
+    if re.search(r"(^|&)(login|signin|action=login)=", query_lower):
+        return False
+    return True
+
+
+def make_corpus(count, seed=0):
+    rng = random.Random(seed)
+    hosts = ["www.ics.uci.edu", "ics.uci.edu", "www.cs.uci.edu", "vision.ics.uci.edu",
+             "www.informatics.uci.edu", "www.stat.uci.edu", "archive.ics.uci.edu",
+             "www.uci.edu", "github.com", "www.google.com", "WWW.ICS.UCI.EDU"]
+    paths = ["/", "/about", "/~eppstein/pubs", "/faculty/profiles/view_faculty.php",
+             "/community/news/view_news", "/events/2019-01-01", "/2019/02/15/post",
+             "/pix/gallery/img", "/bibs/index", "/files/paper.PDF", "/slides/lecture3.pptx",
+             "/repo/-/commit/" + "a" * 40, "/user/login", "/wiki/doku.php", "/img/logo.png",
+             "/archive/20190215-1200", "/research/areas", "/people/students"]
+    queries = ["", "", "", "id=3", "share=twitter", "version=12", "from=rss",
+               "do=edit", "url=http://evil.com", "action=login=1", "date=2020-01-01", "page=2"]
+    schemes = ["https", "https", "https", "http", "mailto", "ftp"]
+    corpus = list()
+    for _ in range(count):
+        query = rng.choice(queries)
+        corpus.append(
+            f"{rng.choice(schemes)}://{rng.choice(hosts)}{rng.choice(paths)}"
+            + (f"?{query}" if query else ""))
+    return corpus
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    corpus = make_corpus(args.urls, args.seed)
+    url_filter = UrlFilter()
+
+    start = time.perf_counter()
+    old = [old_is_valid(url) for url in corpus]
+    old_rate = len(corpus) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    reasons = url_filter.is_valid_many(corpus)
+    new_rate = len(corpus) / (time.perf_counter() - start)
+
+    mismatches = sum(1 for o, r in zip(old, reasons) if o != (r is None))
+    print(f"old is_valid: {old_rate:10.0f} urls/sec")
+    print(f"UrlFilter:    {new_rate:10.0f} urls/sec ({new_rate / old_rate:.1f}x)")
+    print(f"disagreements: {mismatches}")
+    for reason, count in Counter(r or "accepted" for r in reasons).most_common():
+        print(f"  {reason}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""A local stand-in for the spacetime cache server.
+
+Speaks the same protocol utils.download expects: GET /?q=<url>&u=<useragent>
+answered with a cbor dict {"url", "status", "response"} where "response" is a
+pickled requests.Response. Pages come from a deterministic synthetic web graph
+(optionally with traps, near-duplicates, soft 404s and large pages) or are
+replayed from a recording, so crawls are reproducible and need no network or
+registration. Point the crawler at it with launch.py --cache_server:
+
+    python -m benchmarks.cache_server --port 9000 --pages 10000 --latency 0.02 --traps 0.05
+    python launch.py --cache_server 127.0.0.1:9000 --restart
+
+--record FILE appends every response served to FILE (one JSON object per line);
+--replay FILE serves such a file instead of the synthetic web.
+"""
+import asyncio
+import json
+import pickle
+import random
+import threading
+from argparse import ArgumentParser
+from urllib.parse import urlparse, parse_qs
+
+import cbor
+from requests.models import Response as RequestsResponse
+from requests.structures import CaseInsensitiveDict
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vo", "zi", "pa", "qu", "dor", "fen", "gal"]
+
+
+def make_vocabulary(size, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_payload(url, status, content=b"", headers=None):
+    """cbor body the cache server would send for url."""
+    raw = RequestsResponse()
+    raw.status_code = status
+    raw._content = content
+    raw._content_consumed = True
+    raw.headers = CaseInsensitiveDict(headers or {"Content-Type": "text/html; charset=utf-8"})
+    raw.url = url
+    raw.encoding = "utf-8"
+    return cbor.dumps({"url": url, "status": status, "response": pickle.dumps(raw)})
+
+
+class SyntheticWeb(object):
+    ''' `pages` pages spread over `hosts` subdomains of ics.uci.edu, each linking to
+    `outlinks` other pages chosen by a seeded rng. robots.txt is always a 404.
+
+    The other arguments are the fraction of pages that are, respectively:
+    traps (they also link into an endless-looking calendar, /calendar/<i>/<n>
+    linking to <n+1> on a near-identical page, cut off at `trap_depth`),
+    near-duplicates (the body of an earlier page with a few words changed),
+    soft 404s (200 with a "Page Not Found" page), large pages
+    (`large_factor` times the words) and faceted search pages (they also link to
+    `facet_links` /search/<i>?q=..&sort=..&page=.. variants, all near-identical). '''
+
+    def __init__(self, pages=10000, hosts=20, outlinks=20, words_per_page=300, seed=0,
+                 traps=0.0, near_duplicates=0.0, soft404s=0.0, large_pages=0.0,
+                 large_factor=20, trap_depth=100, facets=0.0, facet_links=30):
+        self.pages = pages
+        self.hosts = hosts
+        self.outlinks = outlinks
+        self.words_per_page = words_per_page
+        self.seed = seed
+        self.traps = traps
+        self.near_duplicates = near_duplicates
+        self.soft404s = soft404s
+        self.large_pages = large_pages
+        self.large_factor = large_factor
+        self.trap_depth = trap_depth
+        self.facets = facets
+        self.facet_links = facet_links
+        self.vocabulary = make_vocabulary(5000, seed)
+
+    def url(self, i):
+        return f"https://host{i % self.hosts}.ics.uci.edu/page/{i}"
+
+    def calendar_url(self, i, n):
+        return f"https://host{i % self.hosts}.ics.uci.edu/calendar/{i}/{n}"
+
+    def facet_url(self, i, q, sort, page):
+        return f"https://host{i % self.hosts}.ics.uci.edu/search/{i}?q={q}&sort={sort}&page={page}"
+
+    def seed_urls(self):
+        return [self.url(i) for i in range(min(self.hosts, self.pages))]
+
+    def page_id(self, url):
+        parsed = urlparse(url)
+        parts = parsed.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "page" and parts[1].isdigit():
+            i = int(parts[1])
+            if i < self.pages and parsed.netloc == urlparse(self.url(i)).netloc:
+                return i
+        return None
+
+    def kind(self, i):
+        """"trap", "near_duplicate", "soft404", "large", "facets" or "normal"; fixed per page."""
+        x = random.Random(self.seed * 7919 + i).random()
+        for kind, fraction in (("trap", self.traps), ("near_duplicate", self.near_duplicates),
+                               ("soft404", self.soft404s), ("large", self.large_pages),
+                               ("facets", self.facets)):
+            if x < fraction:
+                return kind
+            x -= fraction
+        return "normal"
+
+    def _words(self, rng, count):
+        return [rng.choice(self.vocabulary) for _ in range(count)]
+
+    def render(self, i):
+        rng = random.Random(self.seed * 1000003 + i)
+        kind = self.kind(i)
+        title = f"Page {i}"
+        words = self._words(rng, self.words_per_page)
+        if kind == "large":
+            words += self._words(rng, self.words_per_page * (self.large_factor - 1))
+        elif kind == "near_duplicate" and i > 0:
+            # an earlier page's text with ~1% of its words replaced
+            words = self.render_words(rng.randrange(i))
+            for _ in range(max(1, len(words) // 100)):
+                words[rng.randrange(len(words))] = rng.choice(self.vocabulary)
+        elif kind == "soft404":
+            title = "Page Not Found"
+            words = ["sorry", "the", "page", "you", "requested", "could", "not", "be", "found"] * 3
+        links = "".join(
+            f'<a href="{self.url(rng.randrange(self.pages))}">link</a>\n'
+            for _ in range(self.outlinks))
+        if kind == "trap":
+            links += f'<a href="{self.calendar_url(i, 0)}">calendar</a>\n'
+        elif kind == "facets":
+            links += "".join(
+                f'<a href="{self.facet_url(i, rng.choice(self.vocabulary), rng.randrange(4), rng.randrange(50))}">'
+                f'filter</a>\n' for _ in range(self.facet_links))
+        return (
+            f"<html><head><title>{title}</title></head>"
+            f"<body><p>{' '.join(words)}</p>\n{links}</body></html>").encode("utf-8")
+
+    def render_words(self, i):
+        """The body words of a normal page i."""
+        return self._words(random.Random(self.seed * 1000003 + i), self.words_per_page)
+
+    def render_calendar(self, i, n):
+        # same template every day, only the date changes, like a real calendar
+        words = self._words(random.Random(self.seed * 1000003 + i), self.words_per_page)
+        links = (f'<a href="{self.calendar_url(i, n - 1)}">previous day</a>\n' if n else "")
+        links += f'<a href="{self.calendar_url(i, n + 1)}">next day</a>\n'
+        return (
+            f"<html><head><title>Calendar day {n}</title></head>"
+            f"<body><p>events on day {n} {' '.join(words)}</p>\n{links}</body></html>").encode("utf-8")
+
+    def render_facet(self, i, query):
+        # the same listing whatever the filters, like a search with no matching results
+        words = self._words(random.Random(self.seed * 1000003 + i), self.words_per_page)
+        return (
+            f"<html><head><title>Search</title></head>"
+            f"<body><p>results for {query} {' '.join(words)}</p></body></html>").encode("utf-8")
+
+    def respond(self, url):
+        """Returns (status, html bytes, headers) for url."""
+        i = self.page_id(url)
+        if i is not None:
+            return 200, self.render(i), None
+        parts = urlparse(url).path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "calendar" and parts[1].isdigit() and parts[2].isdigit():
+            i, n = int(parts[1]), int(parts[2])
+            if i < self.pages and self.kind(i) == "trap" and n < self.trap_depth:
+                return 200, self.render_calendar(i, n), None
+        if len(parts) == 2 and parts[0] == "search" and parts[1].isdigit():
+            i = int(parts[1])
+            if i < self.pages and self.kind(i) == "facets":
+                return 200, self.render_facet(i, urlparse(url).query), None
+        return 404, b"", None
+
+
+class RecordedWeb(object):
+    ''' Responses recorded with CacheServer(record=...), one JSON object per line:
+    {"url", "status", "html", "headers"}. Urls not in the recording are 404s. '''
+
+    def __init__(self, path):
+        self.responses = dict()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self.responses[record["url"]] = record
+
+    def seed_urls(self):
+        return list(self.responses)[:1]
+
+    def respond(self, url):
+        record = self.responses.get(url)
+        if record is None:
+            return 404, b"", None
+        return record["status"], record["html"].encode("utf-8"), record.get("headers")
+
+
+class CacheServer(object):
+    def __init__(self, web, host="127.0.0.1", port=0, latency=0.0, record=None):
+        self.web = web
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.requests = 0
+        self._server = None
+        self._loop = None
+        self._record = open(record, "a", encoding="utf-8", buffering=1) if record else None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                target = request_line.split()[1].decode("latin-1")
+                query = parse_qs(urlparse(target).query)
+                url = query.get("q", [""])[0]
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, content, headers = self.web.respond(url)
+                if self._record:
+                    self._record.write(json.dumps({
+                        "url": url, "status": status,
+                        "html": content.decode("utf-8", "replace"), "headers": headers}) + "\n")
+                body = make_payload(url, status, content, headers)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/cbor\r\n"
+                    + f"Content-Length: {len(body)}\r\n".encode("latin-1")
+                    + b"Connection: keep-alive\r\n\r\n" + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def serve_forever(self):
+        async def main():
+            await self._start()
+            print(f"Cache server stand-in listening on {self.host}:{self.port}", flush=True)
+            async with self._server:
+                await self._server.serve_forever()
+        asyncio.run(main())
+
+    def start_in_thread(self):
+        """Starts serving in a daemon thread; returns the (host, port) to use as config.cache_server."""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return self.host, self.port
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--outlinks", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--words_per_page", type=int, default=300)
+    parser.add_argument("--traps", type=float, default=0.0)
+    parser.add_argument("--near_duplicates", type=float, default=0.0)
+    parser.add_argument("--soft404s", type=float, default=0.0)
+    parser.add_argument("--large_pages", type=float, default=0.0)
+    parser.add_argument("--facets", type=float, default=0.0)
+    parser.add_argument("--record", type=str, default=None)
+    parser.add_argument("--replay", type=str, default=None)
+    args = parser.parse_args()
+    if args.replay:
+        web = RecordedWeb(args.replay)
+    else:
+        web = SyntheticWeb(
+            args.pages, args.hosts, args.outlinks, args.words_per_page, args.seed,
+            args.traps, args.near_duplicates, args.soft404s, args.large_pages, facets=args.facets)
+    print("Seed urls:", ",".join(web.seed_urls()), flush=True)
+    CacheServer(web, args.host, args.port, args.latency, args.record).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
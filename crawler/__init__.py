@@ -1,16 +1,32 @@
 from utils import get_logger
+from utils import download
+from utils.logs import configure_logging, log_writer
+from utils.metrics import metrics, MetricsReporter, SamplingProfiler
 from crawler.frontier import Frontier
 from crawler.worker import Worker
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
+        configure_logging(config.log_max_bytes, config.log_backups)
         self.logger = get_logger("CRAWLER")
+        self.logger.info(
+            "Crawling as %s through cache server %s.", config.user_agent, config.cache_server)
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
+        self.reporter = None
+        self.profiler = None
 
     def start_async(self):
+        if self.config.metrics_interval > 0:
+            self.reporter = MetricsReporter(
+                metrics, self.logger, self.config.metrics_interval,
+                self.config.metrics_file, self.config.metrics_port)
+            self.reporter.start()
+        if self.config.profile_interval > 0:
+            self.profiler = SamplingProfiler(self.config.profile_interval)
+            self.profiler.start()
         self.workers = [
             self.worker_factory(worker_id, self.config, self.frontier)
             for worker_id in range(self.config.threads_count)]
@@ -19,8 +35,33 @@ class Crawler(object):
 
     def start(self):
         self.start_async()
-        self.join()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            # workers are daemon threads, so make sure buffered progress hits the save file
+            self.logger.info("Interrupted. Flushing frontier save file.")
+            self.frontier.close()
+            raise
 
     def join(self):
         for worker in self.workers:
             worker.join()
+        politeness = getattr(self.frontier, "politeness", None)
+        if politeness:
+            politeness.log_summary(self.logger)
+        self.frontier.scraper.traps.log_summary(self.logger)
+        self.frontier.scraper.gate.log_summary(self.logger)
+        self.logger.info(f"Downloads: {download.stats.summary()}")
+        if self.reporter:
+            self.reporter.stop()
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.write(self.config.profile_file)
+            self.logger.info(
+                f"Profile: {self.profiler.samples} samples written to {self.config.profile_file}. Top frames:")
+            for frame, share in self.profiler.top():
+                self.logger.info(f"  {share:6.1%} {frame}")
+        # every worker shares the frontier's scraper, so this is the whole crawl
+        self.frontier.scraper.write_report()
+        self.frontier.close()
+        log_writer.flush()
@@ -0,0 +1,105 @@
+import time
+import asyncio
+
+from threading import Thread
+
+from utils.async_download import AsyncDownloader
+from utils import get_logger
+from utils.logs import AccessLog
+from utils.metrics import metrics
+
+
+class AsyncWorker(Thread):
+    ''' Drop-in alternative to Worker (pass it as Crawler's worker_factory).
+
+    Runs an asyncio event loop in its own thread with up to
+    config.async_concurrency fetches in flight, all sharing the frontier's
+    per-host politeness. Scraping itself is synchronous and runs on the loop
+    between fetches, so results and frontier state are the same as with the
+    threaded Worker. One AsyncWorker (THREADCOUNT = 1) is usually enough. '''
+
+    def __init__(self, worker_id, config, frontier):
+        self.logger = get_logger(f"AsyncWorker-{worker_id}", "Worker")
+        self.worker_id = worker_id
+        self.access_log = AccessLog(config.access_log, config.access_log_sample)
+        self.config = config
+        self.frontier = frontier
+        self.scraper = frontier.scraper
+        super().__init__(daemon=True)
+
+    def run(self):
+        asyncio.run(self._crawl())
+
+    async def _crawl(self):
+        downloader = AsyncDownloader(self.config, self.logger, self.config.download_timeout)
+        slots = asyncio.Semaphore(self.config.async_concurrency)
+        # set whenever a fetch finishes, since that may add urls or end the crawl
+        progress = asyncio.Event()
+        in_flight = set()
+        while True:
+            await slots.acquire()
+            tbd_url, wait = self.frontier.poll_tbd_url()
+            if tbd_url is None:
+                slots.release()
+                if wait is None and not in_flight:
+                    break
+                progress.clear()
+                try:
+                    # wait == None here means only our own fetches are left
+                    await asyncio.wait_for(progress.wait(), wait if wait is not None else 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if self.scraper.is_trap(tbd_url):
+                metrics.incr("rejected.trap_template")
+                slots.release()
+                self.frontier.mark_url_complete(tbd_url)
+                continue
+            allowed = self.scraper.is_allowed(tbd_url)
+            if allowed is None:
+                # robots.txt for this host is still being fetched in the background
+                metrics.incr("postponed.robots")
+                slots.release()
+                self.frontier.postpone(tbd_url, self.scraper.robots.retry_in(tbd_url))
+                continue
+            if not allowed:
+                metrics.incr("rejected.robots")
+                slots.release()
+                self.frontier.mark_url_complete(tbd_url)
+                continue
+            wait = self.frontier.politeness.reserve(tbd_url)
+            if wait > 0:
+                metrics.incr("postponed.politeness")
+                slots.release()
+                self.frontier.postpone(tbd_url, wait)
+                continue
+            task = asyncio.ensure_future(self._process(tbd_url, downloader))
+            in_flight.add(task)
+
+            def done(task):
+                in_flight.discard(task)
+                slots.release()
+                progress.set()
+            task.add_done_callback(done)
+        downloader.close()
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _process(self, tbd_url, downloader):
+        try:
+            # "page" is the whole fetch-scrape-enqueue latency of one url
+            with metrics.timer("page"):
+                started = time.perf_counter()
+                resp = await downloader.download(tbd_url)
+                self.access_log.record(
+                    tbd_url, resp.status, time.perf_counter() - started,
+                    len(resp.raw_response.content) if resp.raw_response else 0, self.worker_id)
+                with metrics.timer("scrape"):
+                    scraped_urls = self.scraper.scraper(tbd_url, resp)
+                with metrics.timer("frontier.add"):
+                    for scraped_url in scraped_urls:
+                        self.frontier.add_url(scraped_url, tbd_url)
+            metrics.incr("pages")
+        except Exception as e:
+            self.logger.error("Failed to process %s: %r", tbd_url, e)
+        finally:
+            self.frontier.mark_url_complete(tbd_url)
@@ -0,0 +1,295 @@
+''' Crawling with several crawler processes that split the url space by host.
+
+Every host belongs to exactly one node, `partition(host, nodes)`, and only that
+node queues, fetches and rate-limits its urls, so politeness and robots.txt
+stay per node and the seen-url sets never overlap. Links a node finds for
+hosts it doesn't own are batched and sent through the Coordinator to their
+owner. The coordinator also decides when the whole crawl is over (every node
+idle and every forwarded batch received) and merges the nodes' report totals
+into one crawl_report.txt.
+
+The coordinator here is a small multiprocessing.connection server, a stand-in
+that lets several nodes run on one machine (or a LAN) without the spacetime
+servers:
+
+    python -m crawler.distributed --nodes 4 --port 9200
+    python3 launch.py --nodes 4 --node_id 0 --coordinator 127.0.0.1:9200   # ... up to --node_id 3
+'''
+import os
+import time
+import zlib
+
+from argparse import ArgumentParser
+from collections import defaultdict
+from multiprocessing.connection import Listener, Client, wait
+from threading import Thread, Lock, Condition, Event
+from urllib.parse import urlparse
+
+from utils import get_logger, get_urlhash, get_urlfingerprint
+from utils.analytics import CrawlAnalytics
+from utils.metrics import metrics
+from utils.seen import SeenUrlSet
+from crawler.frontier import Frontier
+
+AUTHKEY = b"crawler"
+
+
+def partition(host, nodes):
+    """The node that owns host; the same in every process (unlike hash())."""
+    return zlib.crc32(host.lower().encode("utf-8")) % nodes
+
+
+def configure_node(config):
+    """Give this node its own save, metrics, profile and access log files (and
+    metrics port), so several nodes can run from the same folder."""
+    suffix = f".node{config.node_id}"
+    config.save_file += suffix
+    if config.metrics_file:
+        config.metrics_file += suffix
+    if config.metrics_port:
+        config.metrics_port += config.node_id
+    config.profile_file += suffix
+    if config.access_log:
+        root, ext = os.path.splitext(config.access_log)
+        config.access_log = root + suffix + ext
+
+
+class Coordinator(object):
+    ''' Routes forwarded url batches between nodes and detects the end of the crawl.
+
+    Messages from a node: ("hello", node_id), ("urls", owner, [(url, depth)]),
+    ("idle", urls received so far) and, after the end, ("report", state).
+    Messages to a node: ("urls", [(url, depth)]) and ("done",).
+
+    All connections are served from one thread, so messages are handled in
+    order. A node only says it is idle once its own workers are done and its
+    outgoing batches are sent; the crawl is over when every node is idle and has
+    received every url routed to it. '''
+
+    def __init__(self, nodes, address=("127.0.0.1", 9200), report_file="crawl_report.txt"):
+        self.logger = get_logger("COORDINATOR")
+        self.nodes = nodes
+        self.report_file = report_file
+        self.listener = Listener(address, authkey=AUTHKEY)
+        self.address = self.listener.address
+        self.connections = dict()
+        # urls routed to each node, and what each node last said it received while idle
+        self.routed = defaultdict(int)
+        self.idle = dict()
+        self.analytics = CrawlAnalytics()
+        self.started = None
+        self.elapsed = None
+
+    def run(self):
+        self.logger.info(f"Waiting for {self.nodes} nodes on {self.address[0]}:{self.address[1]}")
+        while len(self.connections) < self.nodes:
+            connection = self.listener.accept()
+            _, node_id = connection.recv()
+            self.connections[node_id] = connection
+        self.started = time.time()
+        self.logger.info("All nodes connected.")
+        owners = {connection: node_id for node_id, connection in self.connections.items()}
+        while not self._finished():
+            for connection in wait(list(owners)):
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    self._lost(owners.pop(connection))
+                    continue
+                self._handle(owners[connection], message)
+        self.elapsed = time.time() - self.started
+        self.logger.info(
+            f"Crawl finished in {self.elapsed:.1f}s, "
+            f"{sum(self.routed.values())} urls forwarded between nodes.")
+        for connection in self.connections.values():
+            connection.send(("done",))
+        self._merge_reports(owners)
+        self.listener.close()
+
+    def _lost(self, node_id):
+        self.logger.error(f"Node {node_id} disconnected; urls of its hosts are dropped from now on.")
+        del self.connections[node_id]
+        self.nodes -= 1
+        self.idle.pop(node_id, None)
+
+    def _handle(self, node_id, message):
+        kind = message[0]
+        if kind == "urls":
+            _, owner, urls = message
+            if owner not in self.connections:
+                return
+            self.connections[owner].send(("urls", urls))
+            self.routed[owner] += len(urls)
+            # it has work again
+            self.idle.pop(owner, None)
+        elif kind == "idle":
+            self.idle[node_id] = message[1]
+
+    def _finished(self):
+        return len(self.idle) == self.nodes and all(
+            received == self.routed[node_id] for node_id, received in self.idle.items())
+
+    def _merge_reports(self, owners):
+        pending = dict(owners)
+        while pending:
+            for connection in wait(list(pending)):
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    self.logger.error(f"Node {pending.pop(connection)} left without a report.")
+                    continue
+                if message[0] == "report":
+                    self.analytics.merge(message[1])
+                    pending.pop(connection)
+                    connection.close()
+        self.analytics.write_report(self.report_file, self.logger)
+
+
+class PartitionedFrontier(Frontier):
+    ''' Frontier for one node of a distributed crawl (see Coordinator).
+
+    add_url keeps urls of this node's hosts and batches the rest, sent every
+    FORWARDBATCH urls or FORWARDINTERVAL milliseconds. get_tbd_url / poll_tbd_url
+    only report the end of the crawl once the coordinator says every node is
+    done; until then a locally empty frontier just waits for forwarded urls. '''
+
+    def __init__(self, config, restart):
+        self.node_id = config.node_id
+        self.nodes = config.nodes
+        self._connection = Client(config.coordinator, authkey=AUTHKEY)
+        self._send_lock = Lock()
+        self._send(("hello", self.node_id))
+        # owner -> (url, link depth) waiting to be forwarded
+        self._outbox = defaultdict(list)
+        self._outbox_lock = Lock()
+        # urls already forwarded, so popular links are only sent once
+        self._forwarded = SeenUrlSet()
+        self._received = 0
+        self._reported_idle = None
+        self._arrived = Condition(Lock())
+        self._done = Event()
+        # the seeds are added (and the ones for other nodes forwarded) in here
+        super().__init__(config, restart)
+        self.scraper.report_file = f"crawl_report.node{self.node_id}.txt"
+        Thread(target=self._receive, daemon=True).start()
+        Thread(target=self._flush_periodically, daemon=True).start()
+
+    def _send(self, message):
+        with self._send_lock:
+            self._connection.send(message)
+
+    def add_url(self, url, parent=None, depth=None):
+        url = self.scraper.canonicalizer.canonicalize(url)
+        owner = partition(urlparse(url).netloc, self.nodes)
+        if owner == self.node_id:
+            super().add_url(url, parent, depth)
+            return
+        if not self._forwarded.add(get_urlfingerprint(url, get_urlhash(url))):
+            metrics.incr("duplicate.forwarded")
+            return
+        if depth is None:
+            depth = self.link_depth(url, parent)
+        with self._outbox_lock:
+            batch = self._outbox[owner]
+            # the link depth goes along, so the owner can prioritize the url
+            batch.append((url, depth))
+            if len(batch) < self.config.forward_batch:
+                return
+            del self._outbox[owner]
+            # sent before letting go of the lock, so an idle report can't overtake it (see _idle)
+            self._forward(owner, batch)
+
+    def _forward(self, owner, urls):
+        self._send(("urls", owner, urls))
+        metrics.incr("forwarded", len(urls))
+
+    def _flush_outbox_locked(self):
+        for owner, urls in self._outbox.items():
+            self._forward(owner, urls)
+        self._outbox.clear()
+
+    def flush_outbox(self):
+        with self._outbox_lock:
+            self._flush_outbox_locked()
+
+    def _flush_periodically(self):
+        while not self._done.wait(self.config.forward_interval):
+            self.flush_outbox()
+
+    def _receive(self):
+        while True:
+            try:
+                message = self._connection.recv()
+            except (EOFError, OSError):
+                self.logger.error("Lost the coordinator, stopping.")
+                break
+            if message[0] == "done":
+                break
+            for url, depth in message[1]:
+                super().add_url(url, depth=depth)
+            with self._arrived:
+                self._received += len(message[1])
+                self._arrived.notify_all()
+        self._done.set()
+        with self._arrived:
+            self._arrived.notify_all()
+
+    def _idle(self, received):
+        ''' Called when the local frontier ran dry with `received` forwarded urls
+        added to it. Sends our outbox and tells the coordinator, once per count.
+
+        Batches are only ever taken out of the outbox and sent under the outbox
+        lock, and the idle report goes out under it too: every batch this node
+        has taken is on the wire before "idle", or the coordinator could end
+        the crawl while it is still on its way and drop its urls. '''
+        with self._outbox_lock:
+            self._flush_outbox_locked()
+            with self._arrived:
+                if received != self._reported_idle:
+                    self._reported_idle = received
+                    self._send(("idle", received))
+
+    def get_tbd_url(self):
+        while True:
+            # read before looking at the frontier: every url counted was queued by then
+            received = self._received
+            url = super().get_tbd_url()
+            if url is not None or self._done.is_set():
+                return url
+            self._idle(received)
+            with self._arrived:
+                # until more urls arrive or the coordinator ends the crawl
+                while self._received == received and not self._done.is_set():
+                    self._arrived.wait()
+
+    def poll_tbd_url(self):
+        received = self._received
+        url, wait = super().poll_tbd_url()
+        if url is not None or wait is not None or self._done.is_set():
+            return url, wait
+        self._idle(received)
+        return None, self.config.forward_interval
+
+    def close(self):
+        ''' Close the local frontier, then send its report totals to the coordinator. '''
+        self._done.set()
+        super().close()
+        try:
+            self._send(("report", self.scraper.analytics.state()))
+            self._connection.close()
+        except OSError:
+            self.logger.error("Could not send the report totals to the coordinator.")
+
+
+def main():
+    parser = ArgumentParser(description="Coordinator stand-in for a distributed crawl.")
+    parser.add_argument("--nodes", type=int, required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--report_file", type=str, default="crawl_report.txt")
+    args = parser.parse_args()
+    Coordinator(args.nodes, (args.host, args.port), args.report_file).run()
+
+
+if __name__ == "__main__":
+    main()
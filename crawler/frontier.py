@@ -1,67 +1,273 @@
 import os
-import shelve
+import time
+import heapq
 
-from threading import Thread, RLock
-from queue import Queue, Empty
+from threading import Lock, Condition
+from urllib.parse import urlparse
 
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash, get_urlfingerprint
+from utils.seen import SeenUrlSet
+from utils.metrics import metrics
 from scraper import Scraper
+from crawler.politeness import PolitenessScheduler
+from crawler.priority import BucketQueue, CrawlPriority
+from crawler.storage import get_storage_class
+from crawler.parse_pool import ParsePool
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
         self.scraper = Scraper(self.config, self.logger) #added to share config with scraper, enables calling download() in scraper
-        
-        if not os.path.exists(self.config.save_file) and not restart:
+        if self.config.parse_processes > 0:
+            # html parsing runs in these processes instead of the worker threads
+            self.scraper.parse_pool = ParsePool(
+                self.config.parse_processes, self.config.parser, self.config.parse_queue, self.logger)
+        # shared with the workers, who reserve a host right before fetching from it
+        self.politeness = PolitenessScheduler(self.config, self.scraper.get_crawl_delay)
+
+        # best-first (or the old depth-first) order of urls and hosts, see crawler/priority.py
+        self.priority = CrawlPriority.from_config(getattr(self.config, "priority_rules", {}))
+        # one priority queue of urls per host, plus a heap of (ready_time, host) for
+        # hosts waiting out their politeness delay and a priority queue of the hosts
+        # that may be hit again, so we always hand out the best url of the best ready host
+        self._host_queues = dict()
+        self._ready_heap = list()
+        self._ready_hosts = BucketQueue()
+        # host -> time of its live heap entry; other heap entries for it are stale
+        self._scheduled = dict()
+        # queued or handed out url -> (link depth, links to it found so far)
+        self._pending = dict()
+        self._in_flight = dict()
+        self._in_progress = 0
+        self._queue_cv = Condition(Lock())
+        metrics.gauge("queue_depth", self.queue_depths)
+        # every url ever added, as 64-bit fingerprints; snapshotted next to the save file
+        self.seen_file = self.config.save_file + ".seen"
+        self.seen = None
+        # parsed robots.txt rules, so a resumed crawl doesn't fetch them all again
+        self.robots_file = self.config.save_file + ".robots"
+        # report totals, checkpointed while crawling so a killed crawl keeps them
+        self.scraper.analytics.checkpoint_file = self.config.save_file + ".report"
+        self.scraper.analytics.checkpoint_interval = self.config.report_interval
+
+        storage_class = get_storage_class(self.config.storage)
+        if not storage_class.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+        elif storage_class.exists(self.config.save_file) and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            storage_class.remove(self.config.save_file)
+            analytics = self.scraper.analytics
+            for path in (self.seen_file, self.robots_file, analytics.checkpoint_file, analytics.pages_file):
+                if os.path.exists(path):
+                    os.remove(path)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        # The storage is thread safe and batches writes (see crawler/storage.py).
+        self.save = storage_class(
+            self.config.save_file, self.config.flush_count, self.config.flush_interval)
         if restart:
+            self.seen = SeenUrlSet()
             for url in self.config.seed_urls:
-                self.add_url(url)
+                self.add_url(url, depth=0)
         else:
             # Set the frontier state with contents of save file.
+            self.scraper.robots.load(self.robots_file)
+            # the pages already counted, and their signatures for near-duplicate detection
+            self.scraper.analytics.load(signatures=self.scraper.page_signatures)
             self._parse_save_file()
             if not self.save:
                 for url in self.config.seed_urls:
-                    self.add_url(url)
+                    self.add_url(url, depth=0)
+
+    @property
+    def to_be_downloaded(self):
+        """Snapshot of every url still waiting to be downloaded."""
+        with self._queue_cv:
+            return [url for queue in self._host_queues.values() for url in queue]
 
     def _parse_save_file(self):
-        ''' This function can be overridden for alternate saving techniques. '''
+        ''' This function can be overridden for alternate saving techniques.
+
+        Only the pending urls are read back (see storage.pending()). They already
+        passed is_valid when they were found, so they are only re-checked against
+        the url rules, which are cheap and may have changed in config.ini;
+        robots.txt is checked by the workers right before each fetch. Their link
+        depth is not saved, so it is estimated from their path. '''
         total_count = len(self.save)
+        # the snapshot is only trusted if it was taken with the save file in this state
+        self.seen = SeenUrlSet.load(self.seen_file, tag=total_count)
+        if self.seen is None:
+            self.seen = SeenUrlSet(initial_capacity=2 * total_count)
+            for urlhash in self.save.keys():
+                self.seen.add(get_urlfingerprint(None, urlhash))
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and self.scraper.is_valid(url):
-                self.to_be_downloaded.append(url)
+        for url in self.save.pending():
+            if self.scraper.url_filter.is_valid(url):
+                self._enqueue(url, self.priority.estimated_depth(url))
                 tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def queue_depths(self, top=10):
+        """Urls waiting in total, how many hosts they are spread over, and the deepest host queues."""
+        with self._queue_cv:
+            depths = [(len(queue), host) for host, queue in self._host_queues.items()]
+        return {
+            "urls": sum(depth for depth, _ in depths),
+            "hosts": len(depths),
+            "deepest": {host: depth for depth, host in heapq.nlargest(top, depths)},
+        }
+
+    def _enqueue(self, url, depth, inlinks=0):
+        # get the host's robots.txt coming before the url is handed out
+        self.scraper.robots.prefetch(url)
+        host = urlparse(url).netloc.lower()
+        with self._queue_cv:
+            self._queue_url(host, url, depth, inlinks)
+            if host not in self._scheduled and host not in self._ready_hosts:
+                # host was idle, put it back on the heap at its next allowed time
+                self._schedule(host, self.politeness.next_ready(host))
+            self._queue_cv.notify()
+
+    def _queue_url(self, host, url, depth, inlinks):
+        """Queue url, or move it to its new bucket. Caller must hold self._queue_cv."""
+        queue = self._host_queues.get(host)
+        if queue is None:
+            queue = self._host_queues[host] = self.priority.new_queue()
+        bucket = self.priority.url_bucket(depth, inlinks)
+        queue.push(url, bucket)
+        self._pending[url] = (depth, inlinks)
+        if host in self._ready_hosts and bucket == queue.lowest():
+            # url is the host's best now, which may move the host up
+            self._ready_hosts.push(host, self._host_bucket(host))
+
+    def _add_inlink(self, url, depth):
+        ''' Another link to url, found `depth` links from the seeds, while url is
+        still queued: it moves up, and to the shallower depth if that is one. '''
+        if not self.priority.best_first:
+            return
+        with self._queue_cv:
+            entry = self._pending.get(url)
+            if entry is None:
+                # already fetched or in progress
+                return
+            self._queue_url(urlparse(url).netloc.lower(), url, min(entry[0], depth), entry[1] + 1)
+
+    def _host_bucket(self, host):
+        """Caller must hold self._queue_cv."""
+        fetched, useful = self.scraper.traps.host_yield(host)
+        return self.priority.host_bucket(self._host_queues[host].lowest(), fetched, useful)
+
+    def _schedule(self, host, ready_time):
+        """Caller must hold self._queue_cv."""
+        self._ready_hosts.discard(host)
+        self._scheduled[host] = ready_time
+        heapq.heappush(self._ready_heap, (ready_time, host))
+
+    def _poll_locked(self):
+        """Returns (url, wait). url is None when nothing is ready yet; wait is then
+        how long until something might be ready, or None if the crawl is over.
+        Caller must hold self._queue_cv."""
+        now = time.time()
+        # hosts whose delay has passed join the ready hosts, ranked by priority
+        while self._ready_heap and self._ready_heap[0][0] <= now:
+            ready_time, host = heapq.heappop(self._ready_heap)
+            if self._scheduled.get(host) != ready_time:
+                # stale entry left behind by a reschedule
+                continue
+            actual_ready = self.politeness.next_ready(host)
+            if actual_ready > ready_time:
+                # host was fetched since it was queued, move it to its real slot
+                self._schedule(host, actual_ready)
+                continue
+            del self._scheduled[host]
+            self._ready_hosts.push(host, self._host_bucket(host))
+        if self._ready_hosts:
+            host, _ = self._ready_hosts.pop()
+            queue = self._host_queues[host]
+            url, _ = queue.pop()
+            self._in_flight[url] = self._pending.pop(url)
+            if queue:
+                # the worker reserves the host when it starts the fetch; this is our estimate of that
+                self._schedule(host, now + self.politeness.delay_for(url))
+            else:
+                del self._host_queues[host]
+            self._in_progress += 1
+            return url, 0
+        while self._ready_heap:
+            ready_time, host = self._ready_heap[0]
+            if self._scheduled.get(host) == ready_time:
+                return None, ready_time - now
+            heapq.heappop(self._ready_heap)
+        # nothing queued: done only if nobody is still producing urls
+        return None, (None if self._in_progress == 0 else 1.0)
+
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        ''' Blocks until a url whose host politeness delay has passed is available.
+        Returns None only when the frontier is empty and no url is in progress. '''
+        with self._queue_cv:
+            while True:
+                url, wait = self._poll_locked()
+                if url is not None:
+                    return url
+                if wait is None:
+                    # wake up anyone else waiting so they can stop too
+                    self._queue_cv.notify_all()
+                    return None
+                if wait == 0:
+                    continue
+                # waiting on the host at the top of the heap, if any
+                host = self._ready_heap[0][1] if self._ready_heap else None
+                started = time.time()
+                self._queue_cv.wait(wait)
+                blocked = time.time() - started
+                self.politeness.record_blocked(host, blocked)
+                metrics.observe("frontier.wait", blocked)
+
+    def poll_tbd_url(self):
+        ''' Non-blocking get_tbd_url for event-loop workers. Returns (url, wait) like
+        _poll_locked: wait is the seconds until a url may be ready, or None when
+        the crawl is over. '''
+        with self._queue_cv:
+            return self._poll_locked()
+
+    def postpone(self, url, wait):
+        ''' Give back a url that was handed out but whose host is not ready yet.
+        It is not marked complete, just requeued behind its host's delay. '''
+        host = urlparse(url).netloc.lower()
+        with self._queue_cv:
+            self._in_progress = max(0, self._in_progress - 1)
+            depth, inlinks = self._in_flight.pop(url, (self.priority.estimated_depth(url), 0))
+            self._queue_url(host, url, depth, inlinks)
+            self._schedule(host, time.time() + wait)
+            self._queue_cv.notify()
 
-    def add_url(self, url):
-        url = normalize(url)
+    def link_depth(self, url, parent=None):
+        """Links from the seeds to url, found on parent (estimated when parent is not being fetched)."""
+        entry = self._in_flight.get(parent) if parent is not None else None
+        return entry[0] + 1 if entry is not None else self.priority.estimated_depth(url)
+
+    def add_url(self, url, parent=None, depth=None):
+        ''' url: found on the page of url `parent` being fetched, or `depth` links
+        from the seeds; both only decide how soon url is fetched. '''
+        url = self.scraper.canonicalizer.canonicalize(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
-    
+        if depth is None:
+            depth = self.link_depth(url, parent)
+        # in-memory check, never touches the save file for urls already seen
+        if not self.seen.add(get_urlfingerprint(url, urlhash)):
+            metrics.incr("duplicate.seen")
+            self._add_inlink(url, depth)
+            return
+        self.save[urlhash] = (url, False)
+        self._enqueue(url, depth)
+
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
         if urlhash not in self.save:
@@ -70,4 +276,20 @@ class Frontier(object):
                 f"Completed url {url}, but have not seen it before.")
 
         self.save[urlhash] = (url, True)
-        self.save.sync()
+        with self._queue_cv:
+            self._in_flight.pop(url, None)
+            self._in_progress = max(0, self._in_progress - 1)
+            # the last in-progress url finishing may mean the crawl is over
+            self._queue_cv.notify_all()
+
+    def close(self):
+        ''' Flush any buffered writes to the save file, snapshot the seen urls,
+        robots.txt rules and report totals, and stop the parse processes. '''
+        self.seen.save(self.seen_file, tag=len(self.save))
+        self.scraper.analytics.checkpoint()
+        self.scraper.robots.save(self.robots_file)
+        self.scraper.robots.close()
+        self.save.close()
+        if self.scraper.parse_pool:
+            self.scraper.parse_pool.close()
+            self.scraper.parse_pool = None
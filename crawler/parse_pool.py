@@ -0,0 +1,50 @@
+from threading import BoundedSemaphore, Lock
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from scraper import analyze_page
+
+
+class ParsePool(object):
+    ''' Runs scraper.analyze_page (html parsing, tokenizing, counting, MinHash) in
+    worker processes so CPU-bound parsing is not serialized on the GIL.
+
+    Download threads call analyze() and wait for their own page. At most
+    `max_pending` pages are queued or being parsed at once; past that, analyze()
+    blocks, so downloads can never run ahead of the parsers. A page that fails
+    to parse (an exception in the child, a result that can't be pickled, a
+    crashed process) is logged and counted as unparseable; a broken pool is
+    replaced by a new one. '''
+
+    def __init__(self, processes, backend="bs4", max_pending=None, logger=None):
+        self.backend = backend
+        self.logger = logger
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+        self._executor_lock = Lock()
+        self._slots = BoundedSemaphore(max_pending or 2 * processes)
+
+    def analyze(self, content, base_url):
+        """scraper.PageAnalysis for the page, or None if it could not be parsed."""
+        with self._slots:
+            executor = self._executor
+            try:
+                return executor.submit(analyze_page, content, base_url, self.backend).result()
+            except BrokenProcessPool as e:
+                self._replace(executor)
+                error = e
+            except Exception as e:
+                error = e
+        if self.logger:
+            self.logger.error("Could not parse %s in the parse pool: %r", base_url, error)
+        return None
+
+    def _replace(self, broken):
+        """Start a new pool in place of `broken`, unless another thread already did."""
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+                broken.shutdown(wait=False)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
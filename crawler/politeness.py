@@ -0,0 +1,68 @@
+import time
+
+from threading import Lock
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+class PolitenessScheduler(object):
+    ''' Tracks the last fetch time of every host and decides when it may be hit again.
+    Nothing in here sleeps: callers get back how long to wait and postpone the url. '''
+
+    def __init__(self, config, crawl_delay=None):
+        # crawl_delay: optional function url -> robots crawl-delay in seconds
+        self.config = config
+        self.crawl_delay = crawl_delay
+        self._last_fetch = dict()
+        self._lock = Lock()
+        self.blocked_time = defaultdict(float)
+        self.postponed = defaultdict(int)
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    def delay_for(self, url):
+        """Seconds that must pass between two fetches of url's host."""
+        delay = self.config.time_delay
+        if self.crawl_delay:
+            delay = max(delay, self.crawl_delay(url))
+        return delay
+
+    def next_ready(self, host):
+        """Earliest time host may be fetched again (0 if never fetched)."""
+        with self._lock:
+            last, delay = self._last_fetch.get(host, (0, 0))
+        return last + delay
+
+    def reserve(self, url, now=None):
+        ''' Claim url's host for a fetch right now. Returns 0 and records the fetch
+        if the host is ready, otherwise the seconds left until it is. '''
+        host = self.host_of(url)
+        delay = self.delay_for(url)
+        now = time.time() if now is None else now
+        with self._lock:
+            last, last_delay = self._last_fetch.get(host, (0, 0))
+            wait = last + last_delay - now
+            if wait > 0:
+                self.postponed[host] += 1
+                return wait
+            self._last_fetch[host] = (now, delay)
+        return 0
+
+    def record_blocked(self, host, seconds):
+        """Account time a worker spent idle because host was not ready yet."""
+        if host and seconds > 0:
+            with self._lock:
+                self.blocked_time[host] += seconds
+
+    def log_summary(self, logger, top=20):
+        with self._lock:
+            blocked = sorted(self.blocked_time.items(), key=lambda x: x[1], reverse=True)
+            postponed = dict(self.postponed)
+        total = sum(seconds for _, seconds in blocked)
+        logger.info(f"Workers spent {total:.1f}s blocked on politeness.")
+        for host, seconds in blocked[:top]:
+            logger.info(
+                f"Politeness {host}: blocked {seconds:.1f}s, "
+                f"postponed {postponed.get(host, 0)} urls.")
@@ -0,0 +1,144 @@
+import math
+import heapq
+
+from collections import deque
+
+BEST_FIRST = "bestfirst"
+LIFO = "lifo"
+
+
+class BucketQueue(object):
+    ''' Items (each queued at most once) handed out lowest bucket first: first in,
+    first out within a bucket, or last in, first out with lifo=True.
+
+    Moving an item to another bucket only records its new bucket and appends
+    it there; the old entry is left behind and skipped when it is reached, so
+    re-prioritizing costs O(1) and popping O(log buckets in use). '''
+
+    def __init__(self, lifo=False):
+        self._lifo = lifo
+        # bucket -> deque of items, some of them stale
+        self._buckets = dict()
+        # the buckets in self._buckets, as a heap
+        self._heap = list()
+        # item -> the bucket it is live in
+        self._where = dict()
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, item):
+        return item in self._where
+
+    def __iter__(self):
+        return iter(self._where)
+
+    def push(self, item, bucket):
+        """Queue item in bucket, or move it there if it is already queued elsewhere."""
+        if self._where.get(item) == bucket:
+            return
+        self._where[item] = bucket
+        entries = self._buckets.get(bucket)
+        if entries is None:
+            entries = self._buckets[bucket] = deque()
+            heapq.heappush(self._heap, bucket)
+        entries.append(item)
+
+    def discard(self, item):
+        self._where.pop(item, None)
+
+    def lowest(self):
+        """The lowest bucket holding a live item, or None when empty."""
+        while self._heap:
+            bucket = self._heap[0]
+            entries = self._buckets[bucket]
+            while entries:
+                item = entries[-1] if self._lifo else entries[0]
+                if self._where.get(item) == bucket:
+                    return bucket
+                # moved to another bucket or discarded since it was pushed here
+                if self._lifo:
+                    entries.pop()
+                else:
+                    entries.popleft()
+            del self._buckets[bucket]
+            heapq.heappop(self._heap)
+        return None
+
+    def pop(self):
+        """Returns (item, bucket) of the next item. Raises IndexError when empty."""
+        bucket = self.lowest()
+        if bucket is None:
+            raise IndexError("pop from an empty BucketQueue")
+        entries = self._buckets[bucket]
+        item = entries.pop() if self._lifo else entries.popleft()
+        del self._where[item]
+        return item, bucket
+
+
+class CrawlPriority(object):
+    ''' Scores for the frontier's best-first order (see Frontier), as bucket
+    numbers where lower is crawled sooner.
+
+    A url's bucket grows with its link depth from the seeds and shrinks with
+    the number of pages found linking to it. A host is ranked by its best url,
+    pushed back by the pages already fetched from it (its budget spent, on a
+    log scale) and by the share of them that were not new pages (its yield).
+    Costs are multiplied by RESOLUTION before rounding, so a bucket is a
+    quarter of a link of depth.
+
+    With ORDER = lifo every url and host gets bucket 0 and each host's urls are
+    handed out newest first, the depth-first order of the original frontier. '''
+
+    # (config.ini key, argument, type)
+    OPTIONS = (
+        ("order", "order", str), ("depthweight", "depth_weight", float),
+        ("inlinkweight", "inlink_weight", float), ("budgetweight", "budget_weight", float),
+        ("yieldweight", "yield_weight", float))
+    RESOLUTION = 4
+
+    def __init__(self, order=BEST_FIRST, depth_weight=1.0, inlink_weight=1.0,
+                 budget_weight=0.5, yield_weight=4.0):
+        assert order in (BEST_FIRST, LIFO), f"Unknown frontier order {order}"
+        self.order = order
+        self.best_first = order == BEST_FIRST
+        self.depth_weight = depth_weight
+        self.inlink_weight = inlink_weight
+        self.budget_weight = budget_weight
+        self.yield_weight = yield_weight
+
+    @classmethod
+    def from_config(cls, rules):
+        ''' rules: the [PRIORITY] section of config.ini as a dict (keys lowercase);
+        missing keys fall back to the defaults. '''
+        kwargs = dict()
+        for key, arg, kind in cls.OPTIONS:
+            if key in rules:
+                kwargs[arg] = kind(rules[key].strip().lower())
+        return cls(**kwargs)
+
+    def new_queue(self):
+        """An empty queue for one host's urls."""
+        return BucketQueue(lifo=not self.best_first)
+
+    def url_bucket(self, depth, inlinks):
+        if not self.best_first:
+            return 0
+        cost = self.depth_weight * depth - self.inlink_weight * math.log2(1 + inlinks)
+        return max(0, int(cost * self.RESOLUTION))
+
+    def host_bucket(self, url_bucket, fetched, useful):
+        ''' url_bucket: the host's best queued url; fetched, useful: pages fetched
+        from the host so far, and how many of them were new. '''
+        if not self.best_first:
+            return 0
+        # a host starts at a yield of 1/2 and earns its way up or down
+        yield_ = (useful + 1) / (fetched + 2)
+        penalty = self.budget_weight * math.log2(1 + fetched) + self.yield_weight * (1 - yield_)
+        return url_bucket + int(penalty * self.RESOLUTION)
+
+    @staticmethod
+    def estimated_depth(url):
+        """Link depth guessed from the path, for urls whose parent is unknown (e.g. on resume)."""
+        path = url.split("://", 1)[-1].split("?", 1)[0]
+        return path.count("/")
@@ -0,0 +1,267 @@
+import os
+import shelve
+import sqlite3
+
+from threading import Thread, RLock, Event
+
+from utils.metrics import metrics
+
+
+class BatchedStorage(object):
+    ''' Write-behind key/value store for the frontier's {urlhash: (url, completed)} records.
+
+    Writes are buffered in memory and handed to the backend in one batch every
+    `flush_count` writes or `flush_interval` seconds, whichever comes first, and
+    on close(). Reads see buffered writes immediately. Subclasses implement
+    _read, _write_batch, _len, _items, _keys, _pending_urls and _close. '''
+
+    def __init__(self, path, flush_count=100, flush_interval=0.5):
+        self.path = path
+        self.flush_count = max(1, flush_count)
+        self.flush_interval = flush_interval
+        self._pending = dict()
+        self._lock = RLock()
+        self._closed = Event()
+        self._flusher = None
+        if flush_interval > 0:
+            self._flusher = Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path)
+
+    @classmethod
+    def remove(cls, path):
+        os.remove(path)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+            if len(self._pending) >= self.flush_count:
+                self.flush()
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            return self._read(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        with self._lock:
+            self.flush()
+            return self._len()
+
+    def items(self):
+        with self._lock:
+            self.flush()
+            return list(self._items())
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def keys(self):
+        with self._lock:
+            self.flush()
+            return list(self._keys())
+
+    def pending(self):
+        """Urls not marked completed yet, for resuming a crawl."""
+        with self._lock:
+            self.flush()
+            return list(self._pending_urls())
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, dict()
+            with metrics.timer("storage.flush"):
+                self._write_batch(batch)
+
+    # kept so callers written against shelve keep working
+    sync = flush
+
+    def close(self):
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            self.flush()
+            self._close()
+
+
+class ShelveStorage(BatchedStorage):
+    ''' The original shelve save file, synced once per batch instead of once per write.
+    Makes no crash-consistency promise: a killed process can lose more than the
+    last batch. Use SQLiteStorage if that matters.
+
+    shelve has no index, so the not-completed records are also kept in a second
+    shelf, <path>.pending ({urlhash: url}), and pending() reads only that one.
+    Each batch goes to it first, so after a kill it can only hold urls the save
+    file doesn't have yet, which are then downloaded once more. A save file
+    without one (from before it existed) gets it built by one full scan. With
+    dbm.dumb (when Python has no gdbm or ndbm) opening the shelf still reads every
+    key, so resume time keeps growing with the save file; SQLiteStorage doesn't. '''
+
+    PENDING_SUFFIX = ".pending"
+    # what the dbm modules add to a shelf's path: nothing (gdbm), .db (ndbm),
+    # .dat/.dir/.bak (dbm.dumb)
+    DBM_SUFFIXES = ("", ".db", ".dat", ".dir", ".bak")
+
+    def __init__(self, path, flush_count=100, flush_interval=0.5):
+        if not self._files(path):
+            # a new save file: an index left over from an old one is stale
+            for f in self._files(path + self.PENDING_SUFFIX):
+                os.remove(f)
+        build_index = not self._files(path + self.PENDING_SUFFIX)
+        self._shelf = shelve.open(path)
+        self._pending_shelf = shelve.open(path + self.PENDING_SUFFIX)
+        if build_index:
+            for key, (url, completed) in self._shelf.items():
+                if not completed:
+                    self._pending_shelf[key] = url
+            self._pending_shelf.sync()
+        super().__init__(path, flush_count, flush_interval)
+
+    @classmethod
+    def _files(cls, path):
+        # only the shelf's own files, not <path>.pending or other sidecars
+        return [path + suffix for suffix in cls.DBM_SUFFIXES if os.path.exists(path + suffix)]
+
+    @classmethod
+    def exists(cls, path):
+        return bool(cls._files(path))
+
+    @classmethod
+    def remove(cls, path):
+        for f in cls._files(path) + cls._files(path + cls.PENDING_SUFFIX):
+            try:
+                os.remove(f)
+            except FileNotFoundError:
+                pass
+
+    def _read(self, key):
+        return self._shelf[key]
+
+    def _write_batch(self, batch):
+        for key, (url, completed) in batch.items():
+            if not completed:
+                self._pending_shelf[key] = url
+            elif key in self._pending_shelf:
+                del self._pending_shelf[key]
+        self._pending_shelf.sync()
+        for key, value in batch.items():
+            self._shelf[key] = value
+        self._shelf.sync()
+
+    def _len(self):
+        return len(self._shelf)
+
+    def _items(self):
+        return self._shelf.items()
+
+    def _keys(self):
+        return self._shelf.keys()
+
+    def _pending_urls(self):
+        return self._pending_shelf.values()
+
+    def _close(self):
+        self._pending_shelf.close()
+        self._shelf.close()
+
+
+class SQLiteStorage(BatchedStorage):
+    ''' SQLite in WAL mode; each batch is a single transaction.
+
+    Crash consistency: a batch is either fully in the database or not at all, so
+    after the process is killed the file always opens and holds every batch
+    flushed before the kill. At most the last unflushed batch is lost, and those
+    urls are simply rediscovered or downloaded again.
+
+    A partial index over the not-completed rows makes pending() proportional to
+    the number of pending urls rather than to everything ever discovered. '''
+
+    def __init__(self, path, flush_count=100, flush_interval=0.5):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is safe in WAL mode: a killed process never corrupts the file
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, completed INTEGER NOT NULL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS pending_urls ON urls (url) WHERE completed = 0")
+        super().__init__(path, flush_count, flush_interval)
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path)
+
+    @classmethod
+    def remove(cls, path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _read(self, key):
+        row = self._db.execute(
+            "SELECT url, completed FROM urls WHERE urlhash = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0], bool(row[1])
+
+    def _write_batch(self, batch):
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO urls (urlhash, url, completed) VALUES (?, ?, ?)",
+                ((key, url, int(completed)) for key, (url, completed) in batch.items()))
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _len(self):
+        return self._db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def _items(self):
+        for key, url, completed in self._db.execute(
+                "SELECT urlhash, url, completed FROM urls"):
+            yield key, (url, bool(completed))
+
+    def _keys(self):
+        return (key for key, in self._db.execute("SELECT urlhash FROM urls"))
+
+    def _pending_urls(self):
+        return (url for url, in self._db.execute(
+            "SELECT url FROM urls INDEXED BY pending_urls WHERE completed = 0"))
+
+    def _close(self):
+        self._db.close()
+
+
+STORAGE_BACKENDS = {
+    "shelve": ShelveStorage,
+    "sqlite": SQLiteStorage,
+}
+
+
+def get_storage_class(name):
+    try:
+        return STORAGE_BACKENDS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown STORAGE {name!r}, expected one of {sorted(STORAGE_BACKENDS)}")
@@ -1,24 +1,24 @@
+import time
+
 from threading import Thread
 
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.logs import AccessLog
+from utils.metrics import metrics
 import scraper
-import time
-
-""" I realized is_valid is the wrong place for this code, but we should still implement it somewhere, probably before we download a site. 
-if self.permissions_cache[domain] and self.permissions_cache.crawl_delay('*'):
-            delay = self.permissions_cache.crawl_delay('*')
-            if time.time() - self.time_visited_cache[domain] < delay: # if its been less than delay amount of time since our last visit
-                time.sleep(delay - (time.time() - self.time_visited_cache[domain])) # wait the rest of the time in the delay
-"""
 
 class Worker(Thread):
     def __init__(self, worker_id, config, frontier):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
+        self.worker_id = worker_id
+        self.access_log = AccessLog(config.access_log, config.access_log_sample)
         self.config = config
         self.frontier = frontier
-        self.scraper = scraper.Scraper(self.config, self.logger)
+        # shared with the frontier and the other workers, so robots.txt, duplicate
+        # detection and report stats are only kept once
+        self.scraper = frontier.scraper
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -28,15 +28,44 @@ class Worker(Thread):
         while True:
             tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
+                # the crawler writes the report once every worker has stopped
                 self.logger.info("Frontier is empty. Stopping Crawler.")
-                self.scraper.write_report()
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = self.scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            if self.scraper.is_trap(tbd_url):
+                metrics.incr("rejected.trap_template")
+                self.frontier.mark_url_complete(tbd_url)
+                continue
+            allowed = self.scraper.is_allowed(tbd_url)
+            if allowed is None:
+                # robots.txt for this host is still being fetched in the background
+                metrics.incr("postponed.robots")
+                self.frontier.postpone(tbd_url, self.scraper.robots.retry_in(tbd_url))
+                continue
+            if not allowed:
+                metrics.incr("rejected.robots")
+                self.frontier.mark_url_complete(tbd_url)
+                continue
+            # claim the host for this fetch; if someone hit it too recently,
+            # hand the url back for later instead of sleeping on it
+            wait = self.frontier.politeness.reserve(tbd_url)
+            if wait > 0:
+                metrics.incr("postponed.politeness")
+                self.frontier.postpone(tbd_url, wait)
+                continue
+            try:
+                # "page" is the whole fetch-scrape-enqueue latency of one url
+                with metrics.timer("page"):
+                    started = time.perf_counter()
+                    resp = download(tbd_url, self.config, self.logger)
+                    self.access_log.record(
+                        tbd_url, resp.status, time.perf_counter() - started,
+                        len(resp.raw_response.content) if resp.raw_response else 0, self.worker_id)
+                    with metrics.timer("scrape"):
+                        scraped_urls = self.scraper.scraper(tbd_url, resp)
+                    with metrics.timer("frontier.add"):
+                        for scraped_url in scraped_urls:
+                            self.frontier.add_url(scraped_url, tbd_url)
+                metrics.incr("pages")
+            finally:
+                # always release the url, otherwise other workers wait on it forever
+                self.frontier.mark_url_complete(tbd_url)
@@ -4,14 +4,38 @@ from argparse import ArgumentParser
 from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.distributed import PartitionedFrontier, configure_node
+from crawler.frontier import Frontier
+from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
 
+WORKER_FACTORIES = {"threaded": Worker, "async": AsyncWorker}
 
-def main(config_file, restart):
+
+def main(config_file, restart, cache_server=None, nodes=None, node_id=None, coordinator=None):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    if nodes is not None:
+        config.nodes = nodes
+    if node_id is not None:
+        config.node_id = node_id
+    if coordinator:
+        host, port = coordinator.rsplit(":", 1)
+        config.coordinator = (host, int(port))
+    frontier_factory = Frontier
+    if config.nodes > 1:
+        configure_node(config)
+        frontier_factory = PartitionedFrontier
+    if cache_server:
+        # e.g. the local stand-in from benchmarks/cache_server.py, no registration needed
+        host, port = cache_server.rsplit(":", 1)
+        config.cache_server = (host, int(port))
+    else:
+        config.cache_server = get_cache_server(config, restart)
+    crawler = Crawler(
+        config, restart, frontier_factory=frontier_factory,
+        worker_factory=WORKER_FACTORIES[config.engine])
     crawler.start()
 
 
@@ -19,5 +43,13 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--cache_server", type=str, default=None,
+                        help="host:port of a cache server to use directly, skipping registration")
+    parser.add_argument("--nodes", type=int, default=None,
+                        help="crawler processes in a distributed crawl (overrides NODES)")
+    parser.add_argument("--node_id", type=int, default=None,
+                        help="this process's node number (overrides NODEID)")
+    parser.add_argument("--coordinator", type=str, default=None,
+                        help="host:port of the distributed crawl coordinator (overrides COORDINATOR)")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.cache_server, args.nodes, args.node_id, args.coordinator)
@@ -1,11 +1,18 @@
-import re
-from urllib.parse import urlparse
 #student imports:
-from urllib.robotparser import RobotFileParser #imported to handle robots.txt parsing | https://docs.python.org/3/library/urllib.robotparser.html#module-urllib.robotparser
-import time
-from utils.download import download
+import zlib
 from urllib.parse import urljoin, urldefrag
-from collections import defaultdict
+from collections import namedtuple
+from utils.minhash import MinHashLSH, MinHasher
+from utils.analytics import CrawlAnalytics
+from utils.url_filter import UrlFilter
+from utils.canonicalize import UrlCanonicalizer
+from utils.traps import TrapDetector
+from utils.gate import ResponseGate
+from utils.html_extract import extract
+from utils.robots import RobotsCache
+from utils.tokenize import count_tokens
+from utils.metrics import metrics
+from threading import Lock
 
 
 class Scraper:
@@ -32,80 +39,77 @@ class Scraper:
         "wouldn't", "you", "you'd", "you'll", "you're", "you've", "your", "yours",
         "yourself", "yourselves",
     }
-     # allowed host suffixes per assignment (*.ics.uci.edu, *.cs.uci.edu, etc.)
-    ALLOWED_HOST_SUFFIXES = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu")
     # phrases that indicate a soft 404 (server returns 200 but page is "not found" / error)
     SOFT404_PHRASES = ("not found", "page not found", "404", "error", "page not available")
+    # how much overlap (estimated shared phrases / all phrases) counts as "too similar"
+    NEAR_DUPLICATE_THRESHOLD = 0.85
    
 
-    def __init__(self, config, logger):
+    def __init__(self, config, logger, analytics=None):
+        # one Scraper is shared by the frontier and every worker, so all of the
+        # state below is safe to use from several threads
         self.config = config
         self.logger = logger
-        self.permissions_cache = {}
-        self.time_visited_cache = {}
-        self.visited_urls = set()
-        self.max_length_page = ("", 0)
-        self.word_frequencies = defaultdict(int)
-        # store word-n-gram signatures of pages we've accepted (to avoid near-duplicate content)
-        self.page_signatures = set()
-
-    def _tokenize_text(self, text):
-        """Split on non-letters and keep only tokens of length >= 2 (for counting and n-grams)."""
-        if not text:
-            return []
-        raw = re.split(r"[^a-zA-Z]+", text.lower())
-        return [w for w in raw if len(w) >= 2]
-
-    def _shared_fraction(self, set_a, set_b):
-        """What fraction of items (in either set) appear in both? 0 = nothing in common, 1 = identical."""
-        if not set_a or not set_b:
-            return 0.0
-        in_both = len(set_a & set_b)
-        in_either = len(set_a | set_b)
-        return in_both / in_either if in_either else 0.0
-
-    def _page_too_similar_to_previous(self, tokens):
-        """If this page shares too many 4-word phrases with one we've already seen, skip it (near-duplicate)."""
-        phrase_length = 4
-        # how much overlap (shared phrases / all phrases) counts as "too similar"
-        overlap_threshold = 0.85
-        if len(tokens) < phrase_length:
-            return False
-        # each 4-word chunk gets a hash; we compare sets of these hashes
-        phrases = frozenset(
-            hash(" ".join(tokens[i : i + phrase_length]))
-            for i in range(len(tokens) - phrase_length + 1)
-        )
-        for sig in self.page_signatures:
-            if self._shared_fraction(phrases, sig) >= overlap_threshold:
-                return True
-        self.page_signatures.add(phrases)
-        return False
-
-    def _title_suggests_error_page(self, soup):
+        # robots.txt rules per domain, fetched in the background (see utils/robots.py)
+        self.robots = RobotsCache(
+            config, logger, config.robots_ttl, config.robots_retry, config.robots_max_failures)
+        # unique pages, longest page and word counts (see utils/analytics.py)
+        self.analytics = analytics if analytics is not None else CrawlAnalytics()
+        # where write_report() puts the report by default
+        self.report_file = "crawl_report.txt"
+        # optional crawler.parse_pool.ParsePool, set by the frontier
+        self.parse_pool = None
+        # host allowlist, extension blocklist and trap rules, compiled once
+        self.url_filter = UrlFilter.from_config(getattr(config, "filter_rules", {}))
+        # one spelling per url: case, ports, dot segments, escapes, query order, tracking params
+        self.canonicalizer = UrlCanonicalizer.from_config(getattr(config, "canonicalize_rules", {}))
+        # traps learned per url template from what their pages turn out to be (see utils/traps.py)
+        self.traps = TrapDetector.from_config(getattr(config, "trap_rules", {}))
+        metrics.gauge("traps", self.traps.summary)
+        # content type, binary sniffing, size cap and exact duplicates, before parsing (see utils/gate.py)
+        self.gate = ResponseGate.from_config(getattr(config, "gate_rules", {}))
+        metrics.gauge("gate", self.gate.summary)
+        # MinHash signatures of pages we've accepted (to avoid near-duplicate content)
+        self.page_signatures = MinHashLSH(threshold=self.NEAR_DUPLICATE_THRESHOLD)
+        self._signatures_lock = Lock()
+
+    def _page_too_similar_to_previous(self, signature):
+        """If this page shares too many 4-word phrases with one we've already seen, skip it (near-duplicate).
+        signature is the MinHash of the page's 4-word phrases (see analyze_page)."""
+        if signature is None:
+            return False
+        with self._signatures_lock:
+            return self.page_signatures.check_and_insert(signature)
+
+    @classmethod
+    def _title_suggests_error_page(cls, title):
         """Treat as soft 404 if the title contains a clear error phrase (e.g. 'not found', '404')."""
-        if not soup or not soup.title:
+        if not title:
             return False
-        title = soup.title.get_text().lower().strip()
+        title = title.lower().strip()
         if not title:
             return False
-        return any(phrase in title for phrase in self.SOFT404_PHRASES)
+        return any(phrase in title for phrase in cls.SOFT404_PHRASES)
 
-    def _passes_content_filter(self, tokens):
-        """Reject pages that are too short, too stopword-heavy, or too lexically narrow."""
+    @classmethod
+    def _passes_content_filter(cls, stats):
+        """Reject pages that are too short, too stopword-heavy, or too lexically narrow.
+        stats is the page's utils.tokenize.TokenStats."""
         min_tokens = 15
         max_stopword_ratio = 0.5
         min_unique_ratio = 0.04
-        if not tokens or len(tokens) < min_tokens:
+        if stats.total < min_tokens:
             return False
-        n = len(tokens)
-        stop = sum(1 for t in tokens if t in self.STOPWORDS)
-        distinct = len(set(tokens))
-        return stop / n <= max_stopword_ratio and distinct / n >= min_unique_ratio
+        n = stats.total
+        return stats.stopwords / n <= max_stopword_ratio and stats.distinct / n >= min_unique_ratio
 
     def scraper(self, url, resp):
         links = self.extract_next_links(url, resp)
-        return [link for link in links if self.is_valid(link) and link not in self.visited_urls]
+        with metrics.timer("filter"):
+            valid = [link for link in links if self.is_valid(link)]
+            new = [link for link in valid if not self.analytics.is_visited(link)]
+        metrics.incr("duplicate.visited", len(valid) - len(new))
+        return new
 
     def extract_next_links(self, url, resp):
         # url: the URL that was used to get the page
@@ -116,179 +120,132 @@ class Scraper:
         # Only process 200 OK; skip 403 Forbidden, 404 Not Found, and any other status.
         links = set()
         if resp.status != 200 or not resp.raw_response or not resp.raw_response.content:
+            self.traps.record_fetch(url, "error")
             return list(links)
 
-        try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(resp.raw_response.content, "lxml")
-        except Exception:
-            try:
-                soup = BeautifulSoup(resp.raw_response.content, "html.parser")
-            except Exception:
-                return list(links)
+        # non-html, binary and already seen content never gets parsed; an exact
+        # duplicate a www./bare host pair is being checked on still goes on to observe()
+        canonical = self.canonicalizer.canonicalize(url)
+        with metrics.timer("gate"):
+            content, reason = self.gate.admit(
+                url, resp, dedupe=not self.canonicalizer.awaits_match(canonical))
+        if content is None:
+            metrics.incr("duplicate.exact" if reason == "duplicate_content" else f"rejected.{reason}")
+            self.traps.record_fetch(url, reason)
+            return list(links)
 
+        # parsing, tokenizing and counting don't touch shared state, so they can
+        # run in a parse process (crawler/parse_pool.py) when one is configured
         base_url = resp.url or url
-
-        # remove tags that don't contain meaningful page text 
-        for tag in soup.find_all(
-            ["meta", "script", "style", "noscript", "object", "embed"]):
-            tag.decompose()
-
-        page_text = soup.get_text(separator=" ", strip=True)
-        tokens = self._tokenize_text(page_text)
+        with metrics.timer("parse"):
+            if self.parse_pool:
+                page = self.parse_pool.analyze(content, base_url)
+            else:
+                page = analyze_page(content, base_url, self.config.parser)
+        if page is None:
+            metrics.incr("rejected.unparseable")
+            self.traps.record_fetch(url, "unparseable")
+            return list(links)
 
         # filter order: content first (so we don't store signatures for junk), then duplicate check, then soft 404
-        if not self._passes_content_filter(tokens):
+        if not page.passes_content_filter:
+            metrics.incr("rejected.low_content")
+            self.traps.record_fetch(url, "low_content")
             return list(links)
-        if self._page_too_similar_to_previous(tokens):
+        # before the near-duplicate check, which would drop the www./bare copy of a page
+        alias = self.canonicalizer.observe(canonical, zlib.crc32(page.signature.tobytes()))
+        if alias:
+            self.logger.info(f"{alias} serves the same pages as {self.canonicalizer.aliases[alias]}, merging them.")
+        if self._page_too_similar_to_previous(page.signature):
+            metrics.incr("duplicate.near")
+            self.traps.record_fetch(url, "near_duplicate")
             return list(links)
-        if self._title_suggests_error_page(soup):
+        if page.soft404:
+            metrics.incr("rejected.soft404")
+            self.traps.record_fetch(url, "soft404")
             return list(links)
-
-        # count words on this page: total for Q2 (longest page), non-stopword for Q3 (frequencies)
-        total_word_count = len(tokens)
-        page_counts = defaultdict(int)
-        for t in tokens:
-            if t not in self.STOPWORDS:
-                page_counts[t] += 1
-
-        for w, cnt in page_counts.items():
-            self.word_frequencies[w] += cnt
+        self.traps.record_fetch(url, "ok")
 
         clean_url, _ = urldefrag(url)
-        self.visited_urls.add(clean_url)
-        if total_word_count > self.max_length_page[1]:
-            self.max_length_page = (clean_url, total_word_count)
-
-        # collect all links from <a href="...">
-        for a in soup.find_all("a", href=True):
-            href = a["href"].strip()
-            if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
-                continue
-            try:
-                full = urljoin(base_url, href)
-                full, _ = urldefrag(full)
-                links.add(full)
-            except ValueError:
-                continue
-
-        return list(links)
+        self.analytics.record_page(clean_url, page.word_count, page.page_counts, page.signature)
+        with metrics.timer("canonicalize"):
+            return self.canonicalizer.canonicalize_many(page.links)
 
     def is_valid(self, url):
         # Return True if we should crawl this URL, False otherwise.
+        # Cheap compiled rules first (allowed hosts, extensions, traps; see
+        # utils/url_filter.py), then the learned traps, robots.txt only for urls that pass them.
         try:
-            parsed = urlparse(url)
+            reason = self.url_filter.reject_reason(url) or self.traps.check(url)
+            if reason:
+                metrics.incr(f"rejected.{reason}")
+                return False
         except TypeError:
-            print("TypeError for", url)
+            self.logger.error("TypeError for %s", url)
             raise
-
-        if parsed.scheme not in ("http", "https"):
-            return False
-        if "date=" in url.lower():
-            return False
-
-        # host = the server name, e.g. www.ics.uci.edu or ics.uci.edu
-        host = parsed.netloc.lower()
-        if not (host in self.ALLOWED_HOST_SUFFIXES or any(host.endswith("." + s) for s in self.ALLOWED_HOST_SUFFIXES)):
-            return False
-        # avoid UCI ML repository (very large datasets, per course warning)
-        if host == "archive.ics.uci.edu":
-            return False
-
-        domain = f"{parsed.scheme}://{parsed.netloc}"
-        if domain not in self.permissions_cache:
-            self.create_rfp(domain)
-        rfp = self.permissions_cache[domain]
-        if rfp and not rfp.can_fetch("*", url):
-            return False
-        # respect crawl delay from robots.txt
-        if rfp:
-            delay = rfp.crawl_delay('*')
-            if delay and time.time() - self.time_visited_cache[domain] < delay:
-                time.sleep(delay - (time.time() - self.time_visited_cache[domain]))
-
-        # no pdf, images, etc.
-        if re.match( 
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4|mpg"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
-            return False
-
-        path_lower = parsed.path.lower()
-        query_lower = parsed.query.lower()
-
-        # trap patterns: dates in path (e.g. /2019/02/15/, or YYYYMMDD), repo commit pages, etc.
-        if re.search(r"/\d{4}/\d{1,2}/\d{1,2}(/|$)", path_lower):
-            return False
-        if re.search(r"\d{8}(-\d+)?", path_lower):  # YYYYMMDD or YYYYMMDD-HHMMSS
-            return False
-        if re.search(r"/-/commit/[0-9a-f]{32,40}", path_lower) or re.search(r"/commit/[0-9a-f]{32,40}", path_lower):
+        # unknown robots.txt is fetched in the background and checked again at dispatch
+        if self.robots.allowed(url) is False:
+            metrics.incr("rejected.robots")
             return False
+        return True
 
-        # other known traps: calendar/event traps, image galleries, wiki/doku
-        if re.search(r"/events?/", path_lower):
-            return False
-        for fragment in ("/pix", "/bibs/"):
-            if fragment in path_lower:
-                return False
-        if "version=" in query_lower or "from=" in query_lower:
-            return False
-        if ".php" in path_lower and "http" in query_lower:
-            return False
-        # skip share links (same content as canonical URL)
-        if "share=" in query_lower:
-            return False
-        # skip login/sign-in pages (no crawlable content, often traps)
-        if re.search(r"/(login|signin|sign-in|wp-login|user/login|auth)(/|$|\?)", path_lower):
-            return False
-        if re.search(r"(^|&)(login|signin|action=login)=", query_lower):
-            return False
+    def is_allowed(self, url):
+        ''' The robots.txt half of is_valid, run by the workers right before a fetch.
+        None while the domain's robots.txt hasn't been fetched yet: the url should
+        be postponed by robots.retry_in(url), never fetched or dropped. '''
+        return self.robots.allowed(url)
 
-        return True
+    def is_trap(self, url):
+        """Whether url's template was found to be a trap since url was queued; checked before fetching."""
+        return self.traps.is_blacklisted(url)
 
-    def create_rfp(self, domain):
-        """Fetch and parse robots.txt for this domain, cache the result."""
-        robots_url = f"{domain}/robots.txt"
-        rfp = RobotFileParser(robots_url)
-        resp = download(robots_url, self.config, self.logger)
-        if resp and resp.status == 200 and resp.raw_response:
-            try:
-                rfp.parse(resp.raw_response.text.splitlines())
-            except Exception:
-                pass
-        elif resp and resp.status == 404:
-            pass
-        else:
-            rfp = None
-        self.permissions_cache[domain] = rfp
-        self.time_visited_cache[domain] = time.time()
+    def get_crawl_delay(self, url):
+        """Robots crawl-delay for url's host, from the cache only (0 if unknown or unset)."""
+        return self.robots.crawl_delay(url)
 
-    def write_report(self, output_filename="crawl_report.txt"):
+    def write_report(self, output_filename=None):
         """Write Q1–Q4 stats to a file: unique pages, longest page, top 50 words, subdomains."""
+        self.analytics.write_report(output_filename or self.report_file, self.logger)
+
+
+# what extract_next_links needs from one page; plain data so it can come back from a parse process
+PageAnalysis = namedtuple(
+    "PageAnalysis",
+    ["links", "word_count", "page_counts", "passes_content_filter", "signature", "soft404"])
+
+# same parameters as Scraper.page_signatures, so signatures from any process are comparable
+_page_hasher = MinHasher()
+
+
+def analyze_page(content, base_url, backend="bs4"):
+    """Parse, tokenize and count one page; None if it can't be parsed. Touches no shared state."""
+    # text, title and hrefs, skipping script/style/etc. (see utils/html_extract.py)
+    page = extract(content, backend)
+    if page is None:
+        return None
+    # count words on this page in one pass: total for Q2 (longest page),
+    # non-stopword for Q3 (frequencies), stopword and distinct for the content filter,
+    # and a hash of each 4-word chunk for the near-duplicate check
+    stats = count_tokens(page.text, Scraper.STOPWORDS, 4)
+    if not Scraper._passes_content_filter(stats):
+        return PageAnalysis([], stats.total, {}, False, None, False)
+
+    # the LSH index compares fixed-size MinHash signatures of the chunk hashes
+    signature = _page_hasher.signature(stats.shingles)
+
+    # collect all links from <a href="...">
+    links = set()
+    for href in page.hrefs:
+        href = href.strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+            continue
         try:
-            with open(output_filename, "w", encoding="utf-8", errors="ignore") as f:
-                f.write(f"Q1: {len(self.visited_urls)} unique pages\n\n")
-                url_long, num_long = self.max_length_page
-                f.write(f"Q2: Longest page: {url_long} with {num_long} words\n\n")
-                f.write("Top 50 most common words:\n\n")
-                top50 = sorted(self.word_frequencies.items(), key=lambda x: x[1], reverse=True)[:50]
-                for word, count in top50:
-                    f.write(f"{word}: {count}\n")
-                f.write("\nSubdomains:\n\n")
-                # count how many pages per host (e.g. www.ics.uci.edu, ics.uci.edu)
-                host_counts = defaultdict(int)
-                for u in self.visited_urls:
-                    parsed = urlparse(u)
-                    host = parsed.netloc.lower()
-                    if re.match(r"^(?:[\w-]+\.)?(ics|cs|informatics|stat)\.uci\.edu$", host):
-                        host_counts[host] += 1
-                for host, count in sorted(host_counts.items()):
-                    f.write(f"{host}, {count}\n")
-        except Exception as e:
-            if self.logger:
-                self.logger.error("Error generating crawl report: %s", e)
+            full = urljoin(base_url, href)
+            full, _ = urldefrag(full)
+            links.add(full)
+        except ValueError:
+            continue
+
+    return PageAnalysis(
+        list(links), stats.total, stats.counts, True, signature,
+        Scraper._title_suggests_error_page(page.title))
@@ -1,24 +1,17 @@
-import os
 import logging
 from hashlib import sha256
 from urllib.parse import urlparse
 
+from utils.logs import QueueingHandler, log_writer
+
 def get_logger(name, filename=None):
+    """ Logger writing to Logs/<filename or name>.log and the console through
+    the background writer of utils/logs.py. Calling it again for the same name
+    returns the same logger without adding handlers. """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    if not any(isinstance(handler, QueueingHandler) for handler in logger.handlers):
+        logger.setLevel(logging.INFO)
+        logger.addHandler(QueueingHandler(log_writer.file(f"Logs/{filename if filename else name}.log")))
     return logger
 
 
@@ -29,6 +22,10 @@ def get_urlhash(url):
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
         f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
 
+def get_urlfingerprint(url, urlhash=None):
+    # 64-bit int from the url hash, for compact seen-url sets (see utils/seen.py)
+    return int((urlhash or get_urlhash(url))[:16], 16)
+
 def normalize(url):
     if url.endswith("/"):
         return url.rstrip("/")
@@ -0,0 +1,277 @@
+import os
+import re
+import sys
+import json
+import time
+import struct
+
+from array import array
+from threading import Lock, local
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+from utils import get_urlfingerprint
+from utils.seen import SeenUrlSet
+from utils.topk import SpaceSaving
+
+REPORT_HOST_RE = re.compile(r"^(?:[\w-]+\.)?(ics|cs|informatics|stat)\.uci\.edu$")
+# a counted page in the pages log: url fingerprint, signature length, then the signature
+_PAGE_RECORD = struct.Struct("<QH")
+
+
+class _Buffer(object):
+    """One thread's not-yet-merged page stats."""
+
+    def __init__(self):
+        # taken by its thread per page (so normally uncontended) and by whoever merges it
+        self.lock = Lock()
+        self.pages = 0
+        self.unique_pages = 0
+        self.word_frequencies = Counter()
+        self.host_counts = defaultdict(int)
+        self.max_length_page = ("", 0)
+        # pages log records of the unique pages above
+        self.pages_log = list()
+
+
+class CrawlAnalytics(object):
+    ''' Crawl statistics shared by every worker (unique pages, longest page, word counts).
+
+    Word counts and the longest page are accumulated in a per-thread buffer and
+    merged into the shared totals every FLUSH_EVERY pages, so workers only take
+    the lock once per batch instead of once per word. Unique pages go straight
+    into a shared fingerprint set (bounded memory per url, see utils/seen.py) so
+    duplicates are caught across workers; their hosts are counted on the way in
+    because the urls themselves are not kept.
+
+    Word counts live in a Space-Saving sketch of TOP_WORDS_CAPACITY counters
+    (utils/topk.py) rather than a dict of the whole vocabulary, so the report
+    never sorts more than that. When checkpoint_file is set the totals are
+    written there every checkpoint_interval seconds and can be load()ed on
+    resume or turned into a report mid-crawl (python -m utils.analytics FILE).
+    Next to it, pages_file gets the fingerprint and MinHash signature of every
+    counted page as its buffer is merged; the checkpoint records how far that
+    log went, so load() restores the visited pages and their signatures exactly
+    as counted in the totals, and a resumed crawl neither counts a page twice
+    nor misses a near-duplicate of one fetched before. '''
+
+    FLUSH_EVERY = 50
+    TOP_WORDS_CAPACITY = 10000
+
+    def __init__(self, checkpoint_file=None, checkpoint_interval=60):
+        self._lock = Lock()
+        # one checkpoint written at a time, each with the totals as of its turn
+        self._checkpoint_lock = Lock()
+        self._local = local()
+        self._buffers = list()
+        self.visited_urls = SeenUrlSet()
+        self.unique_pages = 0
+        self.word_frequencies = SpaceSaving(self.TOP_WORDS_CAPACITY)
+        self.host_counts = defaultdict(int)
+        self.max_length_page = ("", 0)
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = time.time()
+        # opened on the first merge, cut back to where the loaded checkpoint left off
+        self._pages_log = None
+        self._pages_offset = 0
+
+    @property
+    def pages_file(self):
+        return self.checkpoint_file + ".pages" if self.checkpoint_file else None
+
+    def _buffer(self):
+        buf = getattr(self._local, "buffer", None)
+        if buf is None:
+            buf = self._local.buffer = _Buffer()
+            with self._lock:
+                self._buffers.append(buf)
+        return buf
+
+    def is_visited(self, url):
+        return get_urlfingerprint(url) in self.visited_urls
+
+    def record_page(self, url, word_count, page_counts, signature=None):
+        ''' Count an accepted page: url (defragmented), total words, non-stopword
+        counts, and its MinHash signature (an array of ints) for the pages log. '''
+        buf = self._buffer()
+        fingerprint = get_urlfingerprint(url)
+        due = False
+        with buf.lock:
+            if self.visited_urls.add(fingerprint):
+                buf.unique_pages += 1
+                buf.host_counts[urlparse(url).netloc.lower()] += 1
+                if self.checkpoint_file:
+                    signature = signature.tobytes() if signature is not None else b""
+                    buf.pages_log.append(_PAGE_RECORD.pack(fingerprint, len(signature) // 8) + signature)
+            buf.pages += 1
+            buf.word_frequencies.update(page_counts)
+            if word_count > buf.max_length_page[1]:
+                buf.max_length_page = (url, word_count)
+            if buf.pages >= self.FLUSH_EVERY:
+                with self._lock:
+                    self._merge(buf)
+                    due = (self.checkpoint_file and
+                           time.time() - self._last_checkpoint >= self.checkpoint_interval)
+                    if due:
+                        self._last_checkpoint = time.time()
+        if due:
+            self._write_checkpoint()
+
+    def _merge(self, buf):
+        """Move buf into the shared totals. Caller must hold buf.lock, then self._lock."""
+        self.unique_pages += buf.unique_pages
+        for word, count in buf.word_frequencies.items():
+            self.word_frequencies.offer(word, count)
+        for host, count in buf.host_counts.items():
+            self.host_counts[host] += count
+        if buf.max_length_page[1] > self.max_length_page[1]:
+            self.max_length_page = buf.max_length_page
+        if buf.pages_log:
+            if self._pages_log is None:
+                self._pages_log = open(self.pages_file, "ab")
+                # records past the checkpoint were never counted in the totals
+                self._pages_log.truncate(self._pages_offset)
+            self._pages_log.write(b"".join(buf.pages_log))
+            buf.pages_log = list()
+        buf.pages = 0
+        buf.unique_pages = 0
+        buf.word_frequencies = Counter()
+        buf.host_counts = defaultdict(int)
+        buf.max_length_page = ("", 0)
+
+    def flush(self):
+        ''' Merge every thread's buffer. Safe while workers are still recording
+        (e.g. the checkpoint on KeyboardInterrupt): each buffer is merged under
+        its own lock, taken before the shared one as record_page does. '''
+        with self._lock:
+            buffers = list(self._buffers)
+        for buf in buffers:
+            with buf.lock:
+                with self._lock:
+                    self._merge(buf)
+
+    def _state(self):
+        """JSON-able copy of the totals. Caller must hold self._lock."""
+        if self._pages_log is not None:
+            self._pages_log.flush()
+            self._pages_offset = self._pages_log.tell()
+        return {
+            "pages_offset": self._pages_offset,
+            "unique_pages": self.unique_pages,
+            "max_length_page": list(self.max_length_page),
+            "word_frequencies": self.word_frequencies.to_dict(),
+            "host_counts": dict(self.host_counts),
+        }
+
+    def _write_checkpoint(self):
+        with self._checkpoint_lock:
+            with self._lock:
+                state = self._state()
+            tmp = self.checkpoint_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.checkpoint_file)
+
+    def checkpoint(self):
+        """Flush every buffer and write the totals to checkpoint_file now."""
+        if not self.checkpoint_file:
+            return
+        self.flush()
+        with self._lock:
+            self._last_checkpoint = time.time()
+        self._write_checkpoint()
+
+    def load(self, path=None, signatures=None):
+        ''' Continue from a checkpoint (checkpoint_file by default); no-op if there is
+        none. The pages it counted go back into visited_urls and, if given, their
+        signatures into `signatures` (a utils.minhash.MinHashLSH). '''
+        path = path or self.checkpoint_file
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self.unique_pages = state["unique_pages"]
+            self.max_length_page = tuple(state["max_length_page"])
+            self.word_frequencies = SpaceSaving.from_dict(state["word_frequencies"])
+            self.host_counts = defaultdict(int, state["host_counts"])
+            self._pages_offset = state.get("pages_offset", 0)
+        for fingerprint, signature in self._read_pages(path + ".pages"):
+            self.visited_urls.add(fingerprint)
+            if signatures is not None and signature:
+                signatures.insert(signature)
+        return True
+
+    def _read_pages(self, path):
+        ''' (url fingerprint, signature) of the pages log records up to
+        self._pages_offset. A log cut short (e.g. by a crash mid-write) is read
+        up to its last whole record, and the offset moved back to there, so
+        the next merge appends after it. '''
+        end = 0
+        try:
+            f = open(path, "rb")
+        except OSError:
+            f = None
+        if f is not None:
+            with f:
+                while end + _PAGE_RECORD.size <= self._pages_offset:
+                    header = f.read(_PAGE_RECORD.size)
+                    if len(header) < _PAGE_RECORD.size:
+                        break
+                    fingerprint, length = _PAGE_RECORD.unpack(header)
+                    body = f.read(8 * length)
+                    if len(body) < 8 * length:
+                        break
+                    signature = array("Q")
+                    signature.frombytes(body)
+                    end += _PAGE_RECORD.size + len(body)
+                    yield fingerprint, signature
+        self._pages_offset = end
+
+    def merge(self, state):
+        ''' Add the totals of another crawl (a checkpoint state, e.g. from another
+        node of a distributed crawl) to these. Pages are assumed not to overlap. '''
+        with self._lock:
+            self.unique_pages += state["unique_pages"]
+            if state["max_length_page"][1] > self.max_length_page[1]:
+                self.max_length_page = tuple(state["max_length_page"])
+            for word, (count, _) in state["word_frequencies"]["counts"].items():
+                self.word_frequencies.offer(word, count)
+            for host, count in state["host_counts"].items():
+                self.host_counts[host] += count
+
+    def state(self):
+        """Flush every buffer and return a JSON-able copy of the totals, as checkpointed."""
+        self.flush()
+        with self._lock:
+            return self._state()
+
+    def write_report(self, output_filename="crawl_report.txt", logger=None):
+        """Write Q1–Q4 stats to a file: unique pages, longest page, top 50 words, subdomains."""
+        self.flush()
+        try:
+            with open(output_filename, "w", encoding="utf-8", errors="ignore") as f:
+                f.write(f"Q1: {self.unique_pages} unique pages\n\n")
+                url_long, num_long = self.max_length_page
+                f.write(f"Q2: Longest page: {url_long} with {num_long} words\n\n")
+                f.write("Top 50 most common words:\n\n")
+                for word, count in self.word_frequencies.top(50):
+                    f.write(f"{word}: {count}\n")
+                f.write("\nSubdomains:\n\n")
+                # how many pages per host (e.g. www.ics.uci.edu, ics.uci.edu)
+                for host, count in sorted(self.host_counts.items()):
+                    if REPORT_HOST_RE.match(host):
+                        f.write(f"{host}, {count}\n")
+        except Exception as e:
+            if logger:
+                logger.error("Error generating crawl report: %s", e)
+
+
+if __name__ == "__main__":
+    # python -m utils.analytics <checkpoint file> [report file]: report of a running or stopped crawl
+    analytics = CrawlAnalytics()
+    if not analytics.load(sys.argv[1]):
+        sys.exit(f"Could not read checkpoint {sys.argv[1]}")
+    analytics.write_report(sys.argv[2] if len(sys.argv) > 2 else "crawl_report.txt")
@@ -0,0 +1,123 @@
+import asyncio
+import cbor
+import time
+
+from urllib.parse import urlencode
+
+from utils.response import Response
+from utils.download import stats
+
+
+class AsyncDownloader(object):
+    ''' asyncio counterpart of utils.download.download.
+
+    Speaks plain HTTP/1.1 to the cache server over keep-alive connections that
+    are reused across fetches, so thousands of fetches can be in flight from a
+    single thread. Concurrency is bounded by the caller. '''
+
+    def __init__(self, config, logger=None, timeout=30):
+        self.config = config
+        self.logger = logger
+        self.timeout = timeout
+        self._idle = list()
+
+    async def _connect(self):
+        if self._idle:
+            return self._idle.pop()
+        host, port = self.config.cache_server
+        stats.connection_opened()
+        return await asyncio.open_connection(host, port)
+
+    def _release(self, conn, keep_alive):
+        reader, writer = conn
+        if keep_alive and not reader.at_eof():
+            self._idle.append(conn)
+        else:
+            writer.close()
+
+    async def _fetch(self, url):
+        ''' Returns (status_code, body bytes). '''
+        host, port = self.config.cache_server
+        query = urlencode([("q", f"{url}"), ("u", f"{self.config.user_agent}")])
+        request = (
+            f"GET /?{query} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            f"Connection: keep-alive\r\n\r\n").encode("latin-1")
+        # an idle connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            conn = await self._connect()
+            reader, writer = conn
+            released = False
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                if not status_line:
+                    raise ConnectionResetError("connection closed by cache server")
+                status = int(status_line.split()[1])
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("transfer-encoding", "").lower() == "chunked":
+                    body = await self._read_chunked(reader)
+                elif "content-length" in headers:
+                    body = await reader.readexactly(int(headers["content-length"]))
+                else:
+                    body = await reader.read()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._release(conn, keep_alive)
+                released = True
+                return status, body
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if attempt:
+                    raise
+            finally:
+                # also when download's timeout cancels us mid-request: a connection
+                # that wasn't handed back is closed rather than leaked
+                if not released:
+                    writer.close()
+                    try:
+                        await writer.wait_closed()
+                    except OSError:
+                        pass
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = list()
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await reader.readline()
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    async def download(self, url):
+        status = None
+        started = time.time()
+        try:
+            status, body = await asyncio.wait_for(self._fetch(url), self.timeout)
+            stats.record(url, len(body), time.time() - started)
+            if body:
+                return Response(cbor.loads(body))
+        except (EOFError, ValueError, OSError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError) as e:
+            status = status or 600
+            stats.record(url, 0, time.time() - started, error=True)
+            if self.logger:
+                self.logger.error("Async download error %r with url %s.", e, url)
+        if self.logger:
+            self.logger.error("Spacetime Response error %s with url %s.", status, url)
+        return Response({
+            "error": f"Spacetime Response error {status} with url {url}.",
+            "status": status,
+            "url": url})
+
+    def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
@@ -0,0 +1,213 @@
+import re
+
+from collections import defaultdict
+from threading import Lock
+from urllib.parse import quote
+
+# scheme, netloc, path (incl. params), query of an absolute http(s) url, any case
+_SPLIT_RE = re.compile(r"([hH][tT][tT][pP][sS]?)://([^/?#]*)([^?#]*)(?:\?([^#]*))?")
+_ESCAPE_RE = re.compile(r"%([0-9A-Fa-f]{2})")
+# characters left as they are in a path or query; anything else is percent-encoded
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9\-._~%/:@!$&'()*+,;=?\[\]]")
+_SAFE = "%/:@!$&'()*+,;=?[]"
+_UNRESERVED = frozenset(
+    ord(c) for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def _fix_escape(match):
+    # %7E -> ~ (unreserved characters never need escaping), %2f -> %2F
+    code = int(match.group(1), 16)
+    return chr(code) if code in _UNRESERVED else "%" + match.group(1).upper()
+
+
+def _normalize_escapes(part):
+    if "%" in part:
+        part = _ESCAPE_RE.sub(_fix_escape, part)
+    if _UNSAFE_RE.search(part):
+        part = quote(part, safe=_SAFE)
+    return part
+
+
+def remove_dot_segments(path):
+    """/a/./b/../c -> /a/c (RFC 3986 5.2.4) for a path starting with '/'."""
+    out = list()
+    segments = path.split("/")[1:]
+    for segment in segments:
+        if segment == "..":
+            if out:
+                out.pop()
+        elif segment != ".":
+            out.append(segment)
+    if segments and segments[-1] in (".", ".."):
+        out.append("")
+    return "/" + "/".join(out)
+
+
+class UrlCanonicalizer(object):
+    ''' Rewrites every spelling of a url to one canonical form, so the frontier
+    and the visited set see one url instead of many.
+
+    The scheme and host are lowercased, default ports and the fragment dropped,
+    dot segments resolved, percent-encoding normalized (%7e -> ~, %2f -> %2F,
+    spaces and non-ascii encoded), session and tracking parameters removed
+    and the rest of the query sorted. Like utils.normalize, a trailing slash is
+    dropped. Rules come from the [CANONICALIZE] section of config.ini when
+    present, otherwise from the defaults below.
+
+    Hosts that serve the same pages with and without "www." are learned from
+    the pages themselves (see observe) and rewritten to whichever was seen first. '''
+
+    # names, or prefixes ending in "*", of query (and ;path) parameters that don't change the page
+    DEFAULT_STRIP_PARAMS = (
+        "utm_*", "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_hsenc",
+        "_hsmi", "sessionid", "session_id", "sid", "phpsessid", "jsessionid", "cfid", "cftoken",
+        "replytocom")
+    # identical pages needed at the same path on www.host and host before they are merged;
+    # a wrong merge loses a host's pages, a missed one only costs duplicate fetches
+    ALIAS_MATCHES = 2
+    # pages remembered while looking for www./bare host pairs
+    MAX_PROBES = 50000
+    # canonical forms remembered, so a url found on many pages is only parsed once
+    CACHE_SIZE = 200000
+
+    def __init__(self, strip_params=DEFAULT_STRIP_PARAMS, learn_aliases=True):
+        names = [p.lower() for p in strip_params]
+        self._strip_names = frozenset(n for n in names if not n.endswith("*"))
+        self._strip_prefixes = tuple(n[:-1] for n in names if n.endswith("*"))
+        self.learn_aliases = learn_aliases
+        # host -> host it was found to be an alias of
+        self.aliases = dict()
+        self._lock = Lock()
+        # (host without www., path?query) -> (host, page digest)
+        self._probes = dict()
+        self._matches = defaultdict(int)
+        # hosts (without www.) already merged, or whose two spellings served different pages
+        self._decided = set()
+        self._cache = dict()
+
+    @classmethod
+    def from_config(cls, rules):
+        ''' rules: the [CANONICALIZE] section of config.ini as a dict (keys
+        lowercase); missing keys fall back to the defaults. '''
+        kwargs = dict()
+        if "stripparams" in rules:
+            kwargs["strip_params"] = tuple(
+                v.strip() for v in re.split(r"[,\s]+", rules["stripparams"]) if v.strip())
+        if "hostaliases" in rules:
+            kwargs["learn_aliases"] = rules["hostaliases"].strip().lower() in ("1", "true", "yes", "on")
+        return cls(**kwargs)
+
+    def _stripped(self, name):
+        name = name.lower()
+        return name in self._strip_names or (
+            bool(self._strip_prefixes) and name.startswith(self._strip_prefixes))
+
+    def _canonical_query(self, query):
+        params = list()
+        for param in query.split("&"):
+            if param and not self._stripped(param.partition("=")[0]):
+                params.append(_normalize_escapes(param))
+        params.sort()
+        return "&".join(params)
+
+    def _canonicalize(self, url):
+        split = _SPLIT_RE.match(url.strip())
+        if not split:
+            # not http(s); the url filter rejects it anyway
+            return url
+        scheme, netloc, path, query = split.groups()
+        scheme = scheme.lower()
+        userinfo, at, host = netloc.rpartition("@")
+        host = host.lower()
+        name, colon, port = host.rpartition(":")
+        if colon and "]" not in port and (not port or port == _DEFAULT_PORTS[scheme]):
+            host = name
+        host = host.rstrip(".")
+        host = self.aliases.get(host, host)
+        if ";" in path:
+            # ;jsessionid=... and friends on the last segment
+            path, _, params = path.partition(";")
+            params = [p for p in params.split(";") if p and not self._stripped(p.partition("=")[0])]
+            if params:
+                path += ";" + ";".join(params)
+        path = _normalize_escapes(path)
+        if "/." in path:
+            path = remove_dot_segments(path)
+        path = path.rstrip("/")
+        query = self._canonical_query(query) if query else ""
+        return f"{scheme}://{userinfo}{at}{host}{path}" + (f"?{query}" if query else "")
+
+    def canonicalize(self, url):
+        canonical = self._cache.get(url)
+        if canonical is None:
+            canonical = self._canonicalize(url)
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            self._cache[url] = canonical
+            self._cache[canonical] = canonical
+        return canonical
+
+    def canonicalize_many(self, urls):
+        """Canonical forms of urls, each once, in the order first seen."""
+        cache = self._cache
+        canonicalize = self.canonicalize
+        out = dict()
+        for url in urls:
+            canonical = cache.get(url)
+            out[canonical if canonical is not None else canonicalize(url)] = None
+        return list(out)
+
+    def awaits_match(self, url):
+        ''' Whether the page at canonical url would be compared with the same
+        page on the other spelling of its host by observe, so it must reach
+        observe even if it is an exact duplicate. '''
+        if not self.learn_aliases:
+            return False
+        split = _SPLIT_RE.match(url)
+        if not split:
+            return False
+        _, host, path, query = split.groups()
+        bare = host[4:] if host.startswith("www.") else host
+        if bare in self._decided:
+            return False
+        probe = self._probes.get((bare, path + "?" + (query or "")))
+        return probe is not None and probe[0] != host
+
+    def observe(self, url, digest):
+        ''' Record that canonical url served a page with this digest (e.g. a hash of
+        its MinHash signature). After ALIAS_MATCHES identical pages at the same
+        path on www.host and host, and no differing ones, the later of the two
+        hosts becomes an alias of the other. Returns the host aliased, if any. '''
+        if not self.learn_aliases:
+            return None
+        split = _SPLIT_RE.match(url)
+        if not split:
+            return None
+        _, host, path, query = split.groups()
+        bare = host[4:] if host.startswith("www.") else host
+        if bare in self._decided:
+            return None
+        key = (bare, path + "?" + (query or ""))
+        with self._lock:
+            probe = self._probes.get(key)
+            if probe is None:
+                if len(self._probes) < self.MAX_PROBES:
+                    self._probes[key] = (host, digest)
+                return None
+            other_host, other_digest = probe
+            if other_host == host or bare in self._decided:
+                return None
+            del self._probes[key]
+            if other_digest != digest:
+                self._decided.add(bare)
+                return None
+            self._matches[bare] += 1
+            if self._matches[bare] < self.ALIAS_MATCHES:
+                return None
+            del self._matches[bare]
+            self._decided.add(bare)
+            self.aliases[host] = other_host
+            # cached forms of the aliased host are out of date
+            self._cache.clear()
+            return host
@@ -4,16 +4,81 @@ import re
 class Config(object):
     def __init__(self, config):
         self.user_agent = config["IDENTIFICATION"]["USERAGENT"].strip()
-        print (self.user_agent)
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        # frontier persistence backend and how often its write-behind buffer is flushed
+        self.storage = config["LOCAL PROPERTIES"].get("STORAGE", "shelve").strip()
+        self.flush_count = int(config["LOCAL PROPERTIES"].get("FLUSHCOUNT", "100"))
+        self.flush_interval = float(config["LOCAL PROPERTIES"].get("FLUSHINTERVAL", "500")) / 1000
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
+        # seconds before a fetch from the cache server is given up on
+        self.download_timeout = float(config["CONNECTION"].get("TIMEOUT", "30"))
+        # keep-alive connections per worker, and retries (with exponential backoff
+        # in seconds) on connection errors and 502/503/504 from the cache server
+        self.pool_size = int(config["CONNECTION"].get("POOLSIZE", "4"))
+        self.download_retries = int(config["CONNECTION"].get("RETRIES", "3"))
+        self.download_backoff = float(config["CONNECTION"].get("BACKOFF", "0.5"))
+
+        # "threaded" runs THREADCOUNT Worker threads, "async" runs AsyncWorkers
+        # with up to ASYNCCONCURRENCY fetches in flight each
+        self.engine = config["LOCAL PROPERTIES"].get("ENGINE", "threaded").strip().lower()
+        self.async_concurrency = int(config["LOCAL PROPERTIES"].get("ASYNCCONCURRENCY", "100"))
+        # processes that parse pages off the GIL (0 = parse in the worker threads), and
+        # how many pages may wait for them before downloads are held back (0 = 2 per process)
+        self.parse_processes = int(config["LOCAL PROPERTIES"].get("PARSEPROCESSES", "0"))
+        self.parse_queue = int(config["LOCAL PROPERTIES"].get("PARSEQUEUE", "0"))
+        # seconds between checkpoints of the report totals to <SAVE>.report
+        self.report_interval = float(config["LOCAL PROPERTIES"].get("REPORTINTERVAL", "60"))
+        # metrics summary every METRICSINTERVAL seconds (0 = off), also written to METRICSFILE
+        # and served as JSON on 127.0.0.1:METRICSPORT when those are set
+        self.metrics_interval = float(config["LOCAL PROPERTIES"].get("METRICSINTERVAL", "30"))
+        self.metrics_file = config["LOCAL PROPERTIES"].get("METRICSFILE", "").strip() or None
+        self.metrics_port = int(config["LOCAL PROPERTIES"].get("METRICSPORT", "0"))
+        # sampling profiler period in milliseconds (0 = off), stacks written to PROFILEFILE
+        self.profile_interval = float(config["LOCAL PROPERTIES"].get("PROFILEINTERVAL", "0")) / 1000
+        self.profile_file = config["LOCAL PROPERTIES"].get("PROFILEFILE", "profile.folded").strip()
+        # one JSON line per fetch in ACCESSLOG (empty = off) for an ACCESSLOGSAMPLE share of
+        # fetches; log files are rotated past LOGMAXBYTES (0 = never), keeping LOGBACKUPS old ones
+        self.access_log = config["LOCAL PROPERTIES"].get("ACCESSLOG", "Logs/access.jsonl").strip() or None
+        self.access_log_sample = float(config["LOCAL PROPERTIES"].get("ACCESSLOGSAMPLE", "1"))
+        self.log_max_bytes = int(config["LOCAL PROPERTIES"].get("LOGMAXBYTES", "0"))
+        self.log_backups = int(config["LOCAL PROPERTIES"].get("LOGBACKUPS", "3"))
+
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        # html extraction backend: "bs4" (full tree) or "stream" (one pass, falls back to bs4)
+        self.parser = config["CRAWLER"].get("PARSER", "bs4").strip().lower()
+        # robots.txt is refetched after ROBOTSTTL seconds; failed fetches are retried
+        # after ROBOTSRETRY, then twice that, ... and given up on (no rules) after ROBOTSMAXFAILURES
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", "86400"))
+        self.robots_retry = float(config["CRAWLER"].get("ROBOTSRETRY", "5"))
+        self.robots_max_failures = int(config["CRAWLER"].get("ROBOTSMAXFAILURES", "3"))
+
+        # optional [FILTER] overrides for the url rules (see utils/url_filter.py)
+        self.filter_rules = dict(config["FILTER"]) if config.has_section("FILTER") else dict()
+        # optional [CANONICALIZE] overrides for url canonicalization (see utils/canonicalize.py)
+        self.canonicalize_rules = dict(config["CANONICALIZE"]) if config.has_section("CANONICALIZE") else dict()
+        # optional [TRAPS] overrides for the adaptive trap detector (see utils/traps.py)
+        self.trap_rules = dict(config["TRAPS"]) if config.has_section("TRAPS") else dict()
+        # optional [GATE] overrides for what responses get parsed (see utils/gate.py)
+        self.gate_rules = dict(config["GATE"]) if config.has_section("GATE") else dict()
+        # optional [PRIORITY] overrides for the frontier's crawl order (see crawler/priority.py)
+        self.priority_rules = dict(config["PRIORITY"]) if config.has_section("PRIORITY") else dict()
+
+        # optional [DISTRIBUTED]: NODES crawler processes split the hosts between them,
+        # this one is NODEID; cross-node links go via COORDINATOR in batches of
+        # FORWARDBATCH urls, sent at least every FORWARDINTERVAL milliseconds
+        distributed = config["DISTRIBUTED"] if config.has_section("DISTRIBUTED") else dict()
+        self.nodes = int(distributed.get("NODES", "1"))
+        self.node_id = int(distributed.get("NODEID", "0"))
+        host, port = distributed.get("COORDINATOR", "127.0.0.1:9200").strip().rsplit(":", 1)
+        self.coordinator = (host, int(port))
+        self.forward_batch = int(distributed.get("FORWARDBATCH", "100"))
+        self.forward_interval = float(distributed.get("FORWARDINTERVAL", "200")) / 1000
 
         self.cache_server = None
\ No newline at end of file
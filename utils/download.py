@@ -1,20 +1,137 @@
 import requests
+import urllib3
 import cbor
 import time
 
+from threading import local, Lock
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from utils.response import Response
+from utils.metrics import metrics
+
+# one requests.Session (and so one keep-alive connection pool) per worker thread
+_sessions = local()
+
+
+class DownloadStats(object):
+    ''' Counts fetches, new connections and bytes so reuse rate and bytes/sec can be reported.
+    Callables appended to `hooks` are told about every fetch as (url, nbytes, seconds). '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.connections = 0
+        self.bytes = 0
+        self.errors = 0
+        self.hooks = list()
+
+    def record(self, url, nbytes, seconds, error=False):
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+            self.errors += error
+        metrics.observe("download", seconds)
+        metrics.incr("bytes", nbytes)
+        if error:
+            metrics.incr("download_errors")
+        for hook in self.hooks:
+            hook(url, nbytes, seconds)
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+
+    @property
+    def reuse_rate(self):
+        """Fraction of fetches that went over an already open connection."""
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.connections / self.requests)
+
+    @property
+    def bytes_per_sec(self):
+        elapsed = time.time() - self.started
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.requests} fetches, {self.errors} errors, "
+            f"connection reuse {self.reuse_rate:.1%}, "
+            f"{self.bytes_per_sec / 1024:.1f} KiB/sec")
+
+
+stats = DownloadStats()
+
+
+class _CountingPool(urllib3.HTTPConnectionPool):
+    ''' Reports every connection it opens (the first one and any reconnect) to stats. '''
+
+    def _new_conn(self):
+        stats.connection_opened()
+        return super()._new_conn()
+
+
+class _CountingAdapter(HTTPAdapter):
+    ''' An HTTPAdapter whose http pools are _CountingPools, so connections are
+    counted as they are opened rather than by looking the pool up again. '''
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(
+            self.poolmanager.pool_classes_by_scheme, http=_CountingPool)
+
+
+def _get_session(config):
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        retries = Retry(
+            total=config.download_retries, backoff_factor=config.download_backoff,
+            status_forcelist=(502, 503, 504), allowed_methods=("GET",),
+            raise_on_status=False)
+        adapter = _CountingAdapter(
+            pool_connections=1, pool_maxsize=config.pool_size, max_retries=retries)
+        session.mount("http://", adapter)
+        _sessions.session = session
+    return session
+
 
 def download(url, config, logger=None):
     host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    cache_url = f"http://{host}:{port}/"
+    session = _get_session(config)
+    started = time.time()
+    try:
+        resp = session.get(
+            cache_url,
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+            timeout=config.download_timeout, stream=True)
+    except requests.RequestException as e:
+        stats.record(url, 0, time.time() - started, error=True)
+        if logger:
+            logger.error("Spacetime request failed for url %s: %r", url, e)
+        return Response({
+            "error": f"Spacetime request failed for url {url}: {e!r}",
+            "status": 600,
+            "url": url})
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
-    except (EOFError, ValueError) as e:
+        with resp:
+            if resp:
+                # decode straight off the socket instead of buffering resp.content first
+                resp.raw.decode_content = True
+                body = cbor.load(resp.raw)
+                if body:
+                    stats.record(url, resp.raw.tell(), time.time() - started)
+                    return Response(body)
+    except (EOFError, ValueError, OSError, requests.RequestException, urllib3.exceptions.HTTPError):
+        # a body cut short or stalled mid-stream surfaces here as urllib3's
+        # ReadTimeoutError/ProtocolError, which requests doesn't wrap when streaming
         pass
-    logger.error(f"Spacetime Response error {resp} with url {url}.")
+    stats.record(url, 0, time.time() - started, error=True)
+    if logger:
+        logger.error("Spacetime Response error %s with url %s.", resp, url)
     return Response({
         "error": f"Spacetime Response error {resp} with url {url}.",
         "status": resp.status_code,
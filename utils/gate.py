@@ -0,0 +1,120 @@
+import re
+from hashlib import blake2b
+from collections import Counter, defaultdict
+from threading import Lock
+from urllib.parse import urlparse
+
+from utils.seen import SeenUrlSet
+
+# leading bytes of formats that are never web pages, whatever the Content-Type says
+_MAGIC = (
+    b"%PDF-", b"%!PS", b"PK\x03\x04", b"\x1f\x8b", b"BZh", b"\xfd7zXZ", b"Rar!", b"7z\xbc\xaf",
+    b"\xd0\xcf\x11\xe0", b"\x89PNG", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"II*\x00",
+    b"MM\x00*", b"RIFF", b"OggS", b"ID3", b"fLaC", b"\x7fELF", b"MZ", b"\xca\xfe\xba\xbe")
+# a NUL in the first bytes means binary, unless the page is UTF-16 (which starts with a BOM)
+_UTF16_BOMS = (b"\xff\xfe", b"\xfe\xff")
+_SNIFF_BYTES = 1024
+
+
+def sniff_binary(content):
+    """Whether content starts like a binary file (pdf, archive, office, image, media, executable)."""
+    head = content[:_SNIFF_BYTES]
+    if head.startswith(_MAGIC) or head[4:8] == b"ftyp":
+        return True
+    return b"\x00" in head and not head.startswith(_UTF16_BOMS)
+
+
+class ResponseGate(object):
+    ''' Decides, from the headers and the first bytes of a response, whether it
+    is worth parsing at all, before any html is parsed or tokenized.
+
+    Rejected: a Content-Type that is set and is not one of CONTENTTYPES (an
+    unset one or application/octet-stream is left to the sniffing), content
+    that starts like a binary file, and, with EXACTDUPLICATES on, content
+    whose hash was already seen on another url. Pages over MAXBYTES are cut to
+    that size before parsing. Rejections are counted per reason and per host. '''
+
+    DEFAULT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+    # Content-Types that say nothing about the content
+    UNKNOWN_CONTENT_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+
+    def __init__(self, content_types=DEFAULT_CONTENT_TYPES, max_bytes=2000000, exact_duplicates=True):
+        self.content_types = frozenset(t.lower() for t in content_types)
+        self.max_bytes = max_bytes
+        self.exact_duplicates = exact_duplicates
+        # 64-bit hashes of the (capped) content of every page let through
+        self._hashes = SeenUrlSet()
+        self._lock = Lock()
+        self.rejected = Counter()
+        # host -> Counter of rejection reasons, and "truncated"
+        self.host_rejections = defaultdict(Counter)
+        self.truncated = 0
+
+    @classmethod
+    def from_config(cls, rules):
+        ''' rules: the [GATE] section of config.ini as a dict (keys lowercase);
+        missing keys fall back to the defaults. '''
+        kwargs = dict()
+        if "contenttypes" in rules:
+            kwargs["content_types"] = tuple(
+                v.strip() for v in re.split(r"[,\s]+", rules["contenttypes"]) if v.strip())
+        if "maxbytes" in rules:
+            kwargs["max_bytes"] = int(rules["maxbytes"].strip())
+        if "exactduplicates" in rules:
+            kwargs["exact_duplicates"] = rules["exactduplicates"].strip().lower() in ("1", "true", "yes", "on")
+        return cls(**kwargs)
+
+    def _count(self, url, reason):
+        with self._lock:
+            if reason != "truncated":
+                self.rejected[reason] += 1
+            else:
+                self.truncated += 1
+            self.host_rejections[urlparse(url).netloc.lower()][reason] += 1
+
+    def admit(self, url, resp, dedupe=True):
+        ''' resp: a 200 response with content. Returns (content to parse, None),
+        the content cut to MAXBYTES, or (None, reason) with reason one of
+        "content_type", "binary", "duplicate_content". dedupe=False still
+        records the page's hash but lets an exact duplicate through. '''
+        raw = resp.raw_response
+        headers = getattr(raw, "headers", None)
+        content_type = (headers.get("Content-Type") or "") if headers else ""
+        content_type = content_type.split(";", 1)[0].strip().lower()
+        if content_type not in self.content_types and content_type not in self.UNKNOWN_CONTENT_TYPES:
+            self._count(url, "content_type")
+            return None, "content_type"
+        content = raw.content
+        if sniff_binary(content):
+            self._count(url, "binary")
+            return None, "binary"
+        if self.max_bytes and len(content) > self.max_bytes:
+            content = content[:self.max_bytes]
+            self._count(url, "truncated")
+        if self.exact_duplicates:
+            digest = int.from_bytes(blake2b(content, digest_size=8).digest(), "big")
+            if not self._hashes.add(digest) and dedupe:
+                self._count(url, "duplicate_content")
+                return None, "duplicate_content"
+        return content, None
+
+    def summary(self, top=10):
+        """Rejections by reason, pages truncated, and the hosts with the most rejections."""
+        with self._lock:
+            hosts = [(sum(reasons.values()), host, dict(reasons))
+                     for host, reasons in self.host_rejections.items()]
+            rejected = dict(self.rejected)
+            truncated = self.truncated
+        return {
+            "rejected": rejected,
+            "truncated": truncated,
+            "top_hosts": {host: reasons for _, host, reasons in sorted(hosts, reverse=True)[:top]},
+        }
+
+    def log_summary(self, logger):
+        summary = self.summary()
+        logger.info(
+            f"Response gate: rejected {summary['rejected'] or 'nothing'}, "
+            f"{summary['truncated']} pages truncated to {self.max_bytes} bytes.")
+        for host, reasons in summary["top_hosts"].items():
+            logger.info(f"  {host}: {reasons}")
@@ -0,0 +1,130 @@
+import codecs
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# what the scraper needs from a page: visible text, <title> text (None if no
+# <title>), and the raw href of every <a> outside the skipped tags
+PageExtract = namedtuple("PageExtract", ["text", "title", "hrefs"])
+
+# tags that don't contain meaningful page text (links inside them are dropped too)
+SKIPPED_TAGS = ("meta", "script", "style", "noscript", "object", "embed")
+
+
+def extract_bs4(content):
+    """Original path: build a BeautifulSoup tree, strip SKIPPED_TAGS, then read it."""
+    try:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(content, "lxml")
+    except Exception:
+        try:
+            soup = BeautifulSoup(content, "html.parser")
+        except Exception:
+            return None
+    for tag in soup.find_all(list(SKIPPED_TAGS)):
+        tag.decompose()
+    title = soup.title.get_text() if soup.title else None
+    hrefs = [a["href"] for a in soup.find_all("a", href=True)]
+    return PageExtract(soup.get_text(separator=" ", strip=True), title, hrefs)
+
+
+class StreamingExtractor(HTMLParser):
+    ''' One pass over the page with no tree: collects text, title and hrefs as the
+    tags stream by, ignoring everything inside SKIPPED_TAGS. '''
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = list()
+        # text seen since the last tag: HTMLParser may hand one text node over in
+        # several handle_data calls (one per fed chunk), so it is joined before use
+        self._pending = list()
+        self.title = None
+        self.hrefs = list()
+        self._skip_depth = 0
+        self._in_title = False
+
+    def _flush_text(self):
+        if self._pending:
+            data = "".join(self._pending).strip()
+            self._pending.clear()
+            if data:
+                self.text.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in SKIPPED_TAGS:
+            if tag != "meta":
+                self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag == "a":
+            # like bs4, a repeated attribute keeps its last value
+            href = None
+            for name, value in attrs:
+                if name == "href" and value is not None:
+                    href = value
+            if href is not None:
+                self.hrefs.append(href)
+        elif tag == "title" and self.title is None:
+            self._in_title = True
+            self.title = ""
+
+    def handle_startendtag(self, tag, attrs):
+        # <a href="..."/> still counts as a link, but never opens a skipped subtree
+        if tag not in SKIPPED_TAGS:
+            self.handle_starttag(tag, attrs)
+        if tag == "title":
+            self._in_title = False
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag in SKIPPED_TAGS:
+            if tag != "meta" and self._skip_depth:
+                self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title += data
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        # comments aren't text, but like bs4 they end the text node before them
+        self._flush_text()
+
+    handle_decl = handle_pi = unknown_decl = handle_comment
+
+    def result(self):
+        self._flush_text()
+        return PageExtract(" ".join(self.text), self.title, self.hrefs)
+
+
+def extract_stream(content, chunk_size=65536):
+    """Streaming path: decode and parse content in chunks, never holding a tree."""
+    parser = StreamingExtractor()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for start in range(0, len(content), chunk_size):
+        parser.feed(decoder.decode(content[start : start + chunk_size]))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.result()
+
+
+EXTRACTORS = {
+    "bs4": extract_bs4,
+    "stream": extract_stream,
+}
+
+
+def extract(content, backend="bs4"):
+    ''' Run the chosen backend, falling back to bs4 if it fails.
+    Returns a PageExtract, or None if the page could not be parsed at all. '''
+    if backend != "bs4":
+        try:
+            return EXTRACTORS[backend](content)
+        except Exception:
+            pass
+    return extract_bs4(content)
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import logging
+
+from collections import defaultdict
+from queue import SimpleQueue, Empty
+from threading import Thread, Event, Lock
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class _LogFile(object):
+    ''' A file only the writer thread writes to: opened on the first batch,
+    flushed once per batch and, past the writer's max_bytes, rotated to
+    path.1, path.2, ... keeping `backups` of them. '''
+
+    def __init__(self, writer, path, format):
+        self.writer = writer
+        self.path = path
+        # item -> line (without the newline)
+        self.format = format
+        self._file = None
+
+    def write(self, lines):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self.writer.max_bytes and self._file.tell() >= self.writer.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self.close()
+        for i in range(self.writer.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.writer.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogWriter(object):
+    ''' The one thread that formats and writes every log record of the process.
+
+    Logging threads only merge the message's arguments and put the record on
+    a queue (see QueueingHandler): timestamps, tracebacks and file and console
+    I/O all happen here, up to BATCH records at a time with one write and flush per
+    file per batch. Records logged right before the process exits are written
+    by an atexit flush. '''
+
+    BATCH = 1000
+
+    def __init__(self):
+        self._queue = SimpleQueue()
+        self._files = dict()
+        self._lock = Lock()
+        self._thread = None
+        # files are rotated past max_bytes (0 = never), keeping `backups` old ones
+        self.max_bytes = 0
+        self.backups = 3
+        # stream for records at console_level and above from loggers that go to the console
+        self.console = sys.stderr
+        self.console_level = logging.INFO
+        self._formatter = logging.Formatter(FORMAT)
+
+    def file(self, path, format=None):
+        """The target for log file `path` (one per path, however many loggers write to it)."""
+        path = os.path.abspath(path)
+        with self._lock:
+            target = self._files.get(path)
+            if target is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                target = self._files[path] = _LogFile(self, path, format or self._formatter.format)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="LogWriter", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        return target
+
+    def put(self, item, target, console=False):
+        self._queue.put((item, target, console))
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.BATCH:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+            self._write(batch)
+
+    def _write(self, batch):
+        lines = defaultdict(list)
+        console = list()
+        flushed = list()
+        for item, target, to_console in batch:
+            if target is None:
+                # a flush() waiting for everything before it to be written
+                flushed.append(item)
+                continue
+            try:
+                line = target.format(item) + "\n"
+            except Exception as e:
+                line = f"Could not format log record {item!r}: {e!r}\n"
+            lines[target].append(line)
+            if to_console and item.levelno >= self.console_level:
+                console.append(line)
+        for target, chunk in lines.items():
+            try:
+                target.write(chunk)
+            except OSError as e:
+                sys.stderr.write(f"Could not write to {target.path}: {e!r}\n")
+        if console and self.console is not None:
+            self.console.write("".join(console))
+            self.console.flush()
+        for done in flushed:
+            done.set()
+
+    def flush(self, timeout=None):
+        """Blocks until everything logged before the call is written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = Event()
+        self.put(done, None)
+        done.wait(timeout)
+
+    def close(self):
+        self.flush(5)
+        with self._lock:
+            for target in self._files.values():
+                target.close()
+
+
+# shared by every logger of the process
+log_writer = LogWriter()
+
+
+class QueueingHandler(logging.Handler):
+    ''' Hands records to log_writer. Like logging.QueueHandler it merges the
+    message's arguments into the message before queueing, since the arguments
+    may change before the writer gets to them; unlike it, it doesn't take the
+    handler lock or apply the formatter in the logging thread. '''
+
+    def __init__(self, target, console=True):
+        super().__init__(logging.DEBUG)
+        self.target = target
+        self.console = console
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def handle(self, record):
+        try:
+            log_writer.put(self.prepare(record), self.target, self.console)
+        except Exception:
+            self.handleError(record)
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+
+def configure_logging(max_bytes=0, backups=3, console=sys.stderr):
+    ''' max_bytes: rotate each log file past this size (0 = never), keeping
+    `backups` old ones; console: stream for INFO and above, or None. '''
+    log_writer.max_bytes = max_bytes
+    log_writer.backups = backups
+    log_writer.console = console
+
+
+def _access_line(entry):
+    t, url, status, seconds, size, worker = entry
+    return json.dumps(
+        {"t": round(t, 3), "url": url, "status": status, "ms": round(seconds * 1000, 1),
+         "bytes": size, "worker": worker},
+        separators=(",", ":"))
+
+
+class AccessLog(object):
+    ''' One JSON line per fetch, {"t", "url", "status", "ms", "bytes", "worker"},
+    for a random `sample` share of the fetches (1 = every fetch). An empty path
+    or a sample of 0 turns it off. Lines are serialized by the writer thread. '''
+
+    def __init__(self, path, sample=1.0):
+        self.sample = sample
+        self._target = log_writer.file(path, _access_line) if path and sample > 0 else None
+
+    def record(self, url, status, seconds, size, worker):
+        if self._target is None or (self.sample < 1 and random.random() >= self.sample):
+            return
+        log_writer.put((time.time(), url, status, seconds, size, worker), self._target)
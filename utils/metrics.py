@@ -0,0 +1,244 @@
+import sys
+import json
+import time
+import os
+
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Thread, Lock, Event, get_ident
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# histogram bucket upper bounds: 10us up to ~80s, 4 buckets per doubling (~19% apart)
+_BOUNDS = [1e-5 * 2 ** (i / 4) for i in range(96)]
+
+
+class Histogram(object):
+    """Latency histogram over fixed log-spaced buckets; percentiles are bucket upper bounds."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.buckets = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = bisect_left(_BOUNDS, seconds)
+        with self._lock:
+            self.buckets[i] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, p):
+        with self._lock:
+            target = p * self.count
+            seen = 0
+            for i, n in enumerate(self.buckets):
+                seen += n
+                if n and seen >= target:
+                    return _BOUNDS[i] if i < len(_BOUNDS) else self.max
+        return 0.0
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5), "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99), "max": self.max,
+        }
+
+
+class _Timer(object):
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Metrics(object):
+    ''' Crawler-wide latency histograms, counters and gauges.
+
+    Stages are timed with `with metrics.timer("parse"):` or metrics.observe();
+    events are counted with metrics.incr("rejected.trap"). Gauges are functions
+    read only when a snapshot is taken (e.g. the frontier's per-host queue
+    depths), so they cost nothing on the hot path. Everything is a lock and a
+    few additions per call, cheap enough to leave on. '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self.started = time.time()
+        self.histograms = defaultdict(Histogram)
+        self.counters = defaultdict(int)
+        self.gauges = dict()
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms[stage]
+        return histogram
+
+    def timer(self, stage):
+        return _Timer(self._histogram(stage))
+
+    def observe(self, stage, seconds):
+        self._histogram(stage).observe(seconds)
+
+    def incr(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] += n
+
+    def gauge(self, name, read):
+        """Register read(), called at snapshot time, as gauge `name`."""
+        self.gauges[name] = read
+
+    def snapshot(self):
+        elapsed = max(1e-9, time.time() - self.started)
+        with self._lock:
+            counters = dict(self.counters)
+        gauges = dict()
+        for name, read in list(self.gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                gauges[name] = repr(e)
+        return {
+            "uptime": elapsed,
+            "counters": counters,
+            "rates": {name: count / elapsed for name, count in counters.items()},
+            "latency": {stage: h.snapshot() for stage, h in list(self.histograms.items())},
+            "gauges": gauges,
+        }
+
+    def summary(self, snapshot=None):
+        """Multi-line text version of a snapshot, for the log."""
+        snapshot = snapshot or self.snapshot()
+        rates = snapshot["rates"]
+        lines = [f"Metrics after {snapshot['uptime']:.0f}s:"]
+        for name, count in sorted(snapshot["counters"].items()):
+            lines.append(f"  {name}: {count} ({rates[name]:.2f}/s)")
+        for stage, h in sorted(snapshot["latency"].items()):
+            lines.append(
+                f"  {stage}: n={h['count']} mean={h['mean'] * 1000:.2f}ms "
+                f"p50={h['p50'] * 1000:.2f}ms p99={h['p99'] * 1000:.2f}ms max={h['max'] * 1000:.2f}ms")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"  {name}: {value}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+class MetricsReporter(Thread):
+    ''' Every `interval` seconds logs metrics.summary() and, when `path` is set,
+    rewrites it as JSON. With `port`, also serves the latest snapshot as JSON
+    over HTTP on 127.0.0.1:port. '''
+
+    def __init__(self, metrics, logger, interval=30, path=None, port=0):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.logger = logger
+        self.interval = interval
+        self.path = path
+        self.port = port
+        self._stopped = Event()
+        self._server = None
+
+    def run(self):
+        if self.port:
+            self._serve()
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        snapshot = self.metrics.snapshot()
+        self.logger.info(self.metrics.summary(snapshot))
+        if self.path:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=1)
+            os.replace(tmp, self.path)
+
+    def _serve(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot(), indent=1).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        self.logger.info(f"Serving metrics on http://127.0.0.1:{self._server.server_port}/")
+
+    def stop(self):
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+        self.report()
+
+
+class SamplingProfiler(Thread):
+    ''' Opt-in statistical profiler: every `interval` seconds it records the
+    Python stack of every other thread. Stacks are written in the folded
+    "frame;frame;frame count" format that flamegraph tools read, and the
+    functions seen most often at the top of a stack are logged. '''
+
+    MAX_DEPTH = 40
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self.samples = 0
+        self._stopped = Event()
+
+    def run(self):
+        me = get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = list()
+                while frame is not None and len(stack) < self.MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def top(self, n=15):
+        """(frame, share of samples) for the frames most often on top of a stack (wall clock,
+        so threads waiting on a lock or socket count too)."""
+        leaves = defaultdict(int)
+        total = 0
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+            total += count
+        return [(name, count / total) for name, count in
+                sorted(leaves.items(), key=lambda x: x[1], reverse=True)[:n]] if total else []
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda x: x[1], reverse=True):
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,121 @@
+import random
+import zlib
+from array import array
+from collections import defaultdict
+
+_MASK64 = (1 << 64) - 1
+# big odd constant used to offset values copied into empty bins (so they don't collide with real ones)
+_DENSIFY_OFFSET = 0x9E3779B97F4A7C15
+
+
+def shingle_hashes(tokens, phrase_length=4):
+    """Hash every phrase_length-word chunk of tokens to a stable 32-bit int.
+
+    crc32 is used instead of hash() so signatures match across processes and runs."""
+    if len(tokens) < phrase_length:
+        return set()
+    crc32, join = zlib.crc32, " ".join
+    # zip of shifted copies yields each chunk as a tuple without slicing the list per chunk
+    return {
+        crc32(join(phrase).encode("utf-8"))
+        for phrase in zip(*(tokens[i:] for i in range(phrase_length)))
+    }
+
+
+class MinHasher:
+    """Turns a set of shingle hashes into a fixed-size MinHash signature.
+
+    Uses one-permutation hashing: each shingle is hashed once and lands in one of
+    num_perm bins, and each bin keeps its minimum. Empty bins borrow from the next
+    non-empty bin to the right (rotation densification). That keeps the Jaccard
+    estimate of classic k-permutation MinHash at O(shingles) instead of
+    O(shingles * num_perm) per page."""
+
+    def __init__(self, num_perm=128, seed=1):
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        self._a = rng.getrandbits(64) | 1
+        self._b = rng.getrandbits(64)
+
+    def signature(self, hashes):
+        """Return an array of num_perm ints; empty input gives all-max (matches nothing)."""
+        k = self.num_perm
+        if not hashes:
+            return array("Q", [_MASK64] * k)
+        a, b = self._a, self._b
+        bins = [_MASK64] * k
+        for h in hashes:
+            # seeded splitmix64-style mix so both the bin and the value look random
+            h = (a * h + b) & _MASK64
+            h = ((h ^ (h >> 31)) * 0xBF58476D1CE4E5B9) & _MASK64
+            h ^= h >> 29
+            i = h % k
+            if h < bins[i]:
+                bins[i] = h
+        filled = bins[:]
+        for i in range(k):
+            if filled[i] == _MASK64:
+                j, dist = (i + 1) % k, 1
+                while filled[j] == _MASK64:
+                    j, dist = (j + 1) % k, dist + 1
+                bins[i] = (filled[j] + dist * _DENSIFY_OFFSET) & _MASK64
+        return array("Q", bins)
+
+
+def estimated_similarity(sig_a, sig_b):
+    """Fraction of matching slots, which estimates the Jaccard similarity of the original sets."""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / len(sig_a)
+
+
+class MinHashLSH:
+    """Locality-sensitive hashing index over MinHash signatures.
+
+    The signature is cut into `bands` bands of `rows` slots each; two pages only
+    get compared if at least one whole band matches, so lookups touch a handful
+    of candidates instead of every page seen so far."""
+
+    def __init__(self, threshold=0.85, num_perm=128, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, seed)
+        self.signatures = []
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, sig):
+        rows = self.rows
+        return [hash(tuple(sig[i * rows : (i + 1) * rows])) for i in range(self.bands)]
+
+    def query(self, sig):
+        """Return True if some indexed signature is estimated at least `threshold` similar."""
+        seen = set()
+        for band, key in enumerate(self._band_keys(sig)):
+            for doc_id in self._buckets[band].get(key, ()):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                if estimated_similarity(sig, self.signatures[doc_id]) >= self.threshold:
+                    return True
+        return False
+
+    def insert(self, sig):
+        doc_id = len(self.signatures)
+        self.signatures.append(sig)
+        for band, key in enumerate(self._band_keys(sig)):
+            self._buckets[band][key].append(doc_id)
+        return doc_id
+
+    def check_and_insert(self, sig):
+        """Add sig unless it is a near-duplicate; returns True if it was a near-duplicate."""
+        if self.query(sig):
+            return True
+        self.insert(sig)
+        return False
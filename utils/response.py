@@ -6,8 +6,9 @@ class Response(object):
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
         try:
+            # pop so the pickled bytes can be freed as soon as they are decoded
             self.raw_response = (
-                pickle.loads(resp_dict["response"])
+                pickle.loads(resp_dict.pop("response"))
                 if "response" in resp_dict else
                 None)
         except TypeError:
@@ -0,0 +1,155 @@
+import os
+import pickle
+import time
+
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from utils.download import download
+
+
+class _Rules(object):
+    """robots.txt of one domain: the raw lines (None = allow everything) and when to fetch again."""
+
+    def __init__(self, domain, lines, expires):
+        self.lines = lines
+        self.expires = expires
+        self.parser = RobotFileParser(f"{domain}/robots.txt")
+        if lines is None:
+            self.parser.allow_all = True
+        else:
+            self.parser.parse(lines)
+
+
+class RobotsCache(object):
+    ''' robots.txt rules for every domain, shared by the scraper and the workers.
+
+    Lookups never download anything. An unknown or expired domain is queued for
+    a background fetch (one per domain however many threads ask), and until its
+    first answer arrives allowed() returns None so callers can postpone the url.
+    Expired rules keep being served while they are refreshed.
+
+    A 200 is parsed, any other 4xx means no rules. 429, 5xx, cache server
+    errors and failed downloads are retried after `retry`, 2*`retry`, ...
+    seconds; after `max_failures` in a row the domain is treated as having no
+    rules until `ttl` runs out, so one bad robots.txt can't stall its host. '''
+
+    PREFETCH_THREADS = 4
+    USER_AGENT = "*"
+
+    def __init__(self, config, logger, ttl=86400, retry=5, max_failures=3):
+        self.config = config
+        self.logger = logger
+        self.ttl = ttl
+        self.retry = retry
+        self.max_failures = max_failures
+        self._rules = dict()
+        # domain -> (consecutive failures, time of the next attempt)
+        self._failures = dict()
+        self._in_flight = set()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.PREFETCH_THREADS, thread_name_prefix="robots")
+        self.fetches = 0
+
+    @staticmethod
+    def domain_of(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _current(self, domain):
+        ''' Cached rules for domain (None if there are none yet), starting a
+        background fetch if they are missing or expired. '''
+        now = time.time()
+        with self._lock:
+            rules = self._rules.get(domain)
+            if rules is not None and rules.expires > now:
+                return rules
+            failures = self._failures.get(domain)
+            if domain not in self._in_flight and (failures is None or failures[1] <= now):
+                self._in_flight.add(domain)
+                self._executor.submit(self._fetch, domain)
+            return rules
+
+    def prefetch(self, url):
+        """Start fetching url's robots.txt in the background if it isn't cached."""
+        self._current(self.domain_of(url))
+
+    def allowed(self, url):
+        """True or False by url's robots.txt, or None while it hasn't been fetched yet."""
+        rules = self._current(self.domain_of(url))
+        if rules is None:
+            return None
+        return rules.parser.can_fetch(self.USER_AGENT, url)
+
+    def retry_in(self, url):
+        """Seconds until allowed(url) might stop returning None."""
+        with self._lock:
+            failures = self._failures.get(self.domain_of(url))
+        if failures is None:
+            return 0.5
+        return max(0.5, failures[1] - time.time())
+
+    def crawl_delay(self, url):
+        """Crawl-delay for url's host from the cache (0 if unknown or unset)."""
+        with self._lock:
+            rules = self._rules.get(self.domain_of(url))
+        delay = rules.parser.crawl_delay(self.USER_AGENT) if rules else None
+        return float(delay) if delay else 0.0
+
+    def _fetch(self, domain):
+        try:
+            resp = download(f"{domain}/robots.txt", self.config, self.logger)
+        except Exception as e:
+            self.logger.error(f"Failed to fetch {domain}/robots.txt: {e!r}")
+            resp = None
+        self.fetches += 1
+        now = time.time()
+        with self._lock:
+            self._in_flight.discard(domain)
+            status = resp.status if resp else None
+            if status == 200 and resp.raw_response is not None:
+                lines = resp.raw_response.text.splitlines()
+            elif status is not None and 400 <= status < 500 and status != 429:
+                lines = None
+            else:
+                count = self._failures.get(domain, (0, 0))[0] + 1
+                if count < self.max_failures:
+                    self._failures[domain] = (count, now + self.retry * 2 ** (count - 1))
+                    return
+                self.logger.info(
+                    f"robots.txt for {domain} failed {count} times (status {status}), "
+                    f"crawling it without rules.")
+                lines = None
+            self._failures.pop(domain, None)
+            try:
+                self._rules[domain] = _Rules(domain, lines, now + self.ttl)
+            except Exception:
+                # unparseable robots.txt, same as none at all
+                self._rules[domain] = _Rules(domain, None, now + self.ttl)
+
+    def save(self, path):
+        """Write the cached rules to path (atomically), to be load()ed on resume."""
+        with self._lock:
+            state = {domain: (rules.lines, rules.expires) for domain, rules in self._rules.items()}
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Restore rules saved by save(); expired ones are still served until refreshed."""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        with self._lock:
+            for domain, (lines, expires) in state.items():
+                self._rules[domain] = _Rules(domain, lines, expires)
+        self.logger.info(f"Loaded robots.txt rules for {len(state)} domains from {path}.")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,175 @@
+import math
+import os
+import pickle
+
+from array import array
+from threading import Lock
+
+
+class BloomFilter(object):
+    """Fixed-size Bloom filter over 64-bit fingerprints (double hashing on the two halves)."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, fp):
+        h1, h2 = fp & 0xFFFFFFFF, (fp >> 32) | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def __contains__(self, fp):
+        bits = self.bits
+        for p in self._positions(fp):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def add(self, fp):
+        bits = self.bits
+        for p in self._positions(fp):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter(object):
+    ''' Bloom filter that never fills up: when the newest filter reaches capacity a
+    bigger one with a tighter error rate is added, so the overall false positive
+    rate stays under error_rate however many fingerprints go in. '''
+
+    def __init__(self, initial_capacity=1 << 16, error_rate=0.01, growth=2, tightening=0.5):
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def __contains__(self, fp):
+        return any(fp in f for f in reversed(self.filters))
+
+    def add(self, fp):
+        last = self.filters[-1]
+        if last.count >= last.capacity:
+            last = BloomFilter(last.capacity * self.growth, last.error_rate * self.tightening)
+            self.filters.append(last)
+        last.add(fp)
+
+    @property
+    def nbytes(self):
+        return sum(len(f.bits) for f in self.filters)
+
+
+class FingerprintTable(object):
+    ''' Open-addressing hash set of 64-bit fingerprints in one flat array('Q'),
+    8 bytes per slot and at most half full. 0 marks an empty slot. '''
+
+    def __init__(self, capacity=1 << 16):
+        size = 1 << max(4, (2 * capacity - 1).bit_length())
+        self.slots = array("Q", bytes(8 * size))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, fp):
+        """Index of fp's slot, or of the empty slot where it would go."""
+        slots = self.slots
+        mask = len(slots) - 1
+        i = (fp ^ (fp >> 29)) & mask
+        while True:
+            cur = slots[i]
+            if cur == fp or cur == 0:
+                return i
+            i = (i + 1) & mask
+
+    def __contains__(self, fp):
+        fp = fp or 1
+        return self.slots[self._find(fp)] == fp
+
+    def add(self, fp):
+        """Returns True if fp was not in the table yet."""
+        fp = fp or 1
+        i = self._find(fp)
+        if self.slots[i] == fp:
+            return False
+        self.slots[i] = fp
+        self.count += 1
+        if 2 * self.count > len(self.slots):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self.slots
+        self.slots = array("Q", bytes(16 * len(old)))
+        for fp in old:
+            if fp:
+                self.slots[self._find(fp)] = fp
+
+    @property
+    def nbytes(self):
+        return len(self.slots) * self.slots.itemsize
+
+
+class SeenUrlSet(object):
+    ''' Thread-safe set of url fingerprints with bounded memory per url.
+
+    Split into `stripes` independently locked parts. In each one a scalable
+    Bloom filter answers most "never seen" lookups without touching the
+    table, and a FingerprintTable gives the exact answer for the rest. Saved
+    to and loaded from a single file so a resumed crawl doesn't rebuild it. '''
+
+    def __init__(self, stripes=16, initial_capacity=1 << 16, error_rate=0.01):
+        per_stripe = max(1024, initial_capacity // stripes)
+        self._stripes = [
+            (Lock(), ScalableBloomFilter(per_stripe, error_rate), FingerprintTable(per_stripe))
+            for _ in range(stripes)]
+
+    def _stripe(self, fp):
+        return self._stripes[(fp >> 56) % len(self._stripes)]
+
+    def __contains__(self, fp):
+        lock, bloom, table = self._stripe(fp)
+        with lock:
+            return fp in bloom and fp in table
+
+    def add(self, fp):
+        """Add fp; returns True if it had not been seen before."""
+        lock, bloom, table = self._stripe(fp)
+        with lock:
+            if fp in bloom and fp in table:
+                return False
+            bloom.add(fp)
+            table.add(fp)
+            return True
+
+    def __len__(self):
+        return sum(len(table) for _, _, table in self._stripes)
+
+    @property
+    def nbytes(self):
+        return sum(bloom.nbytes + table.nbytes for _, bloom, table in self._stripes)
+
+    def save(self, path, tag=None):
+        ''' Write a snapshot to path (atomically). tag is stored alongside so the
+        loader can tell whether the snapshot still matches the save file. '''
+        state = {"tag": tag, "stripes": [(bloom, table) for _, bloom, table in self._stripes]}
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, tag=None):
+        """The snapshot at path, or None if it is missing, unreadable or was saved with another tag."""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if state.get("tag") != tag:
+            return None
+        seen = cls.__new__(cls)
+        seen._stripes = [(Lock(), bloom, table) for bloom, table in state["stripes"]]
+        return seen
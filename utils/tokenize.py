@@ -0,0 +1,36 @@
+import re
+
+from collections import Counter, namedtuple
+
+from utils.minhash import shingle_hashes
+
+# runs of 2+ letters; the same tokens as re.split("[^a-zA-Z]+") on the lowercased
+# text with 1-letter pieces dropped, but found in one scan with no empty strings
+_TOKEN_RE = re.compile(r"[a-z]{2,}")
+
+TokenStats = namedtuple("TokenStats", ["tokens", "total", "stopwords", "distinct", "counts", "shingles"])
+
+
+def tokenize(text):
+    """Lowercased tokens of 2+ letters, in order."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def count_tokens(text, stopwords=frozenset(), phrase_length=None):
+    ''' Tokenize, count and (optionally) shingle one page from a single tokenize.
+
+    Returns TokenStats: the tokens, how many there are, how many are
+    stopwords, how many are distinct, a Counter of the non-stopword tokens,
+    and the shingle hashes of every phrase_length-word chunk (None if
+    phrase_length is None). The pass over the tokens is Counter's C loop; only
+    the distinct words are touched from Python after that. '''
+    tokens = tokenize(text)
+    counts = Counter(tokens)
+    distinct = len(counts)
+    stop = 0
+    for word in stopwords.intersection(counts):
+        stop += counts.pop(word)
+    shingles = None if phrase_length is None else shingle_hashes(tokens, phrase_length)
+    return TokenStats(tokens, len(tokens), stop, distinct, counts, shingles)
@@ -0,0 +1,60 @@
+import heapq
+
+
+class SpaceSaving(object):
+    ''' Top-k counts in bounded memory (the Space-Saving sketch of Metwally et al.).
+
+    Keeps at most `capacity` counters. While fewer distinct items than that have
+    been seen every count is exact; after that a new item takes over the
+    smallest counter, so a count can be overestimated by at most the total
+    weight divided by capacity, and any item more frequent than that is kept. '''
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        # item -> [count, overestimation]
+        self.counts = dict()
+        # (count, item) min-heap; entries whose count is out of date are skipped
+        self._heap = list()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def offer(self, item, weight=1):
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            entry = self.counts[item] = [weight, 0]
+        else:
+            min_count, min_item = self._pop_min()
+            del self.counts[min_item]
+            entry = self.counts[item] = [min_count + weight, min_count]
+        heapq.heappush(self._heap, (entry[0], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, (count, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            entry = self.counts.get(item)
+            if entry is not None and entry[0] == count:
+                return count, item
+
+    def top(self, k):
+        """The k largest (item, count) pairs, largest first."""
+        return heapq.nlargest(
+            k, ((item, count) for item, (count, _) in self.counts.items()), key=lambda x: x[1])
+
+    def to_dict(self):
+        """Plain copy of the counters (JSON-able for string items), for from_dict."""
+        return {"capacity": self.capacity,
+                "counts": {item: list(entry) for item, entry in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["capacity"])
+        sketch.counts = {item: list(entry) for item, entry in state["counts"].items()}
+        sketch._heap = [(count, item) for item, (count, _) in sketch.counts.items()]
+        heapq.heapify(sketch._heap)
+        return sketch
@@ -0,0 +1,252 @@
+import re
+import math
+
+from collections import Counter, OrderedDict, defaultdict
+from threading import Lock
+
+# host, path (incl. params), query of an absolute http(s) url, already lowercased
+_SPLIT_RE = re.compile(r"https?://([^/?#]*)([^?#]*)(?:\?([^#]*))?")
+# hex ids and uuids, then any other run of digits, become placeholders in url templates
+_ID_RE = re.compile(r"[0-9a-f]{16,}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_NUMBER_RE = re.compile(r"\d+")
+
+# bits in each template's bitmap of query strings (linear counting)
+_VALUE_BITS = 1024
+
+OK = "ok"
+THROTTLED = "throttled"
+BLACKLISTED = "blacklisted"
+
+
+def url_template(host, path, query):
+    """host/path with numbers and ids replaced, plus the sorted query parameter names:
+    https://a.edu/cal/2019/05?m=1&d=2 -> a.edu/cal/{n}/{n}?d&m"""
+    path = _NUMBER_RE.sub("{n}", _ID_RE.sub("{id}", path))
+    if not query:
+        return host + path
+    names = sorted({param.partition("=")[0] for param in query.split("&") if param})
+    return f"{host}{path}?{'&'.join(names)}"
+
+
+class _Template(object):
+    __slots__ = ("discovered", "fetched", "useful", "yield_", "values", "skipped")
+
+    def __init__(self):
+        self.discovered = 0
+        self.fetched = 0
+        self.useful = 0
+        # share of recent fetches that gave a new page (a running mean over the
+        # first WINDOW fetches, then an exponential moving average)
+        self.yield_ = 1.0
+        self.values = 0
+        self.skipped = 0
+
+    def query_values(self):
+        """Estimated distinct query strings seen for this template."""
+        zeros = _VALUE_BITS - bin(self.values).count("1")
+        if zeros == 0:
+            return float("inf")
+        return -_VALUE_BITS * math.log(zeros / _VALUE_BITS)
+
+
+class TrapDetector(object):
+    ''' Learns crawler traps per host from the urls found and the pages fetched,
+    next to the fixed rules of utils/url_filter.py.
+
+    Every url is mapped to a template (url_template: numbers, ids and query
+    values stripped). Per template it keeps how many urls were found, how many
+    distinct query strings (in a 1 Kbit bitmap), and the yield of its fetches:
+    the share that gave a new page rather than a near-duplicate, soft 404,
+    low-content page or error. Once a template has MINFETCHES fetches:
+      - yield below BLACKLISTYIELD: its urls are no longer crawled;
+      - yield below THROTTLEYIELD (twice that for templates with more than
+        MAXQUERYVALUES distinct queries, i.e. faceted search): only 1 in
+        THROTTLEEVERY newly found urls is crawled, so the yield can recover.
+    Paths deeper than MAXDEPTH segments or repeating a segment MAXREPEATS
+    times are rejected outright. At most MAXTEMPLATES templates are kept, the
+    least recently used one is forgotten first; a blacklisted template keeps
+    its verdict in a second set of at most MAXTEMPLATES keys. So memory is
+    bounded and each url costs one template lookup. '''
+
+    # (config.ini key, argument, type)
+    OPTIONS = (
+        ("maxdepth", "max_depth", int), ("maxrepeats", "max_repeats", int),
+        ("minfetches", "min_fetches", int), ("throttleyield", "throttle_yield", float),
+        ("blacklistyield", "blacklist_yield", float), ("throttleevery", "throttle_every", int),
+        ("maxqueryvalues", "max_query_values", int), ("maxtemplates", "max_templates", int))
+    # fetches averaged before the yield becomes a moving average
+    WINDOW = 20
+
+    def __init__(self, enabled=True, max_depth=12, max_repeats=3, min_fetches=20,
+                 throttle_yield=0.2, blacklist_yield=0.05, throttle_every=10,
+                 max_query_values=500, max_templates=100000):
+        self.enabled = enabled
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.min_fetches = min_fetches
+        self.throttle_yield = throttle_yield
+        self.blacklist_yield = blacklist_yield
+        self.throttle_every = throttle_every
+        self.max_query_values = max_query_values
+        self.max_templates = max_templates
+        self._lock = Lock()
+        # least recently used first
+        self._templates = OrderedDict()
+        # key -> urls found, for templates that were blacklisted when evicted
+        self._blacklisted = OrderedDict()
+        # host -> Counter of fetch outcomes ("ok", "near_duplicate", "soft404", ...)
+        self.host_outcomes = defaultdict(Counter)
+
+    @classmethod
+    def from_config(cls, rules):
+        ''' rules: the [TRAPS] section of config.ini as a dict (keys lowercase);
+        missing keys fall back to the defaults. '''
+        kwargs = dict()
+        if "adaptive" in rules:
+            kwargs["enabled"] = rules["adaptive"].strip().lower() in ("1", "true", "yes", "on")
+        for key, arg, kind in cls.OPTIONS:
+            if key in rules:
+                kwargs[arg] = kind(rules[key].strip())
+        return cls(**kwargs)
+
+    def _split(self, url):
+        split = _SPLIT_RE.match(url.lower())
+        return split.groups() if split else None
+
+    def _template(self, key):
+        """Caller must hold self._lock."""
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = _Template()
+            if len(self._templates) > self.max_templates:
+                self._evict()
+        else:
+            self._templates.move_to_end(key)
+        return template
+
+    def _evict(self):
+        """Caller must hold self._lock."""
+        key, template = self._templates.popitem(last=False)
+        if self._state(template) == BLACKLISTED:
+            self._blacklisted[key] = template.discovered
+            if len(self._blacklisted) > self.max_templates:
+                self._blacklisted.popitem(last=False)
+
+    def _evicted_blacklisted(self, key, discovered=0):
+        """Whether key was blacklisted when it was evicted. Caller must hold self._lock."""
+        if key not in self._blacklisted:
+            return False
+        self._blacklisted[key] += discovered
+        self._blacklisted.move_to_end(key)
+        return True
+
+    def _state(self, template):
+        if template.fetched < self.min_fetches:
+            return OK
+        if template.yield_ < self.blacklist_yield:
+            return BLACKLISTED
+        if template.yield_ >= 2 * self.throttle_yield:
+            return OK
+        if template.yield_ < self.throttle_yield or template.query_values() > self.max_query_values:
+            return THROTTLED
+        return OK
+
+    def check(self, url):
+        ''' Called for every url found on a page. Returns the reason to drop it
+        ("deep_path", "repeating_path", "trap_template", "throttled_template")
+        or None to crawl it. '''
+        if not self.enabled:
+            return None
+        split = self._split(url)
+        if split is None:
+            return None
+        host, path, query = split
+        segments = [segment for segment in path.split("/") if segment]
+        if len(segments) > self.max_depth:
+            return "deep_path"
+        # a segment can only repeat max_repeats times if that many are not distinct
+        if len(segments) - len(set(segments)) >= self.max_repeats - 1 and \
+                Counter(segments).most_common(1)[0][1] >= self.max_repeats:
+            return "repeating_path"
+        key = url_template(host, path, query)
+        with self._lock:
+            if self._evicted_blacklisted(key, 1):
+                return "trap_template"
+            template = self._template(key)
+            template.discovered += 1
+            if query:
+                template.values |= 1 << (hash(query) % _VALUE_BITS)
+            state = self._state(template)
+            if state == BLACKLISTED:
+                return "trap_template"
+            if state == THROTTLED:
+                template.skipped += 1
+                if template.skipped % self.throttle_every:
+                    return "throttled_template"
+        return None
+
+    def is_blacklisted(self, url):
+        """Whether url's template was blacklisted (e.g. since the url was queued)."""
+        if not self.enabled:
+            return False
+        split = self._split(url)
+        if split is None:
+            return False
+        key = url_template(*split)
+        with self._lock:
+            if key in self._blacklisted:
+                return True
+            template = self._templates.get(key)
+            return template is not None and self._state(template) == BLACKLISTED
+
+    def record_fetch(self, url, outcome):
+        ''' Called once per fetched url with what the content filters made of it:
+        "ok" for a new page, otherwise why it was not kept. '''
+        split = self._split(url)
+        if split is None:
+            return
+        useful = outcome == OK
+        with self._lock:
+            self.host_outcomes[split[0]][outcome] += 1
+            if not self.enabled:
+                return
+            key = url_template(*split)
+            if self._evicted_blacklisted(key):
+                return
+            template = self._template(key)
+            template.fetched += 1
+            template.useful += useful
+            weight = 1 / min(template.fetched, self.WINDOW)
+            template.yield_ += weight * (useful - template.yield_)
+
+    def host_yield(self, host):
+        """(pages fetched from host, how many of them were new pages) so far."""
+        with self._lock:
+            outcomes = self.host_outcomes.get(host)
+            if not outcomes:
+                return 0, 0
+            return sum(outcomes.values()), outcomes[OK]
+
+    def summary(self, top=10):
+        """Template counts by verdict and the blacklisted/throttled templates found most often."""
+        with self._lock:
+            verdicts = [(self._state(t), t.discovered, key) for key, t in self._templates.items()]
+            verdicts += [(BLACKLISTED, discovered, key) for key, discovered in self._blacklisted.items()]
+        counts = Counter(state for state, _, _ in verdicts)
+        flagged = sorted(
+            ((discovered, key, state) for state, discovered, key in verdicts if state != OK),
+            reverse=True)[:top]
+        return {
+            "templates": len(verdicts),
+            "throttled": counts[THROTTLED],
+            "blacklisted": counts[BLACKLISTED],
+            "top": {key: f"{state}, {discovered} urls found" for discovered, key, state in flagged},
+        }
+
+    def log_summary(self, logger):
+        summary = self.summary()
+        logger.info(
+            f"Trap detector: {summary['templates']} url templates, {summary['throttled']} "
+            f"throttled, {summary['blacklisted']} blacklisted.")
+        for key, verdict in summary["top"].items():
+            logger.info(f"  {key}: {verdict}")
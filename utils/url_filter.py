@@ -0,0 +1,142 @@
+import re
+
+# scheme, netloc, path (incl. params), query of an absolute http(s) url; faster than urlparse
+_SPLIT_RE = re.compile(r"(https?)://([^/?#]*)([^?#]*)(?:\?([^#]*))?")
+
+
+class UrlFilter(object):
+    ''' Compiled URL rules behind Scraper.is_valid (everything except robots.txt).
+
+    Each URL is lowercased and split once, then checked against a host regex and
+    one combined regex each for the path, the query and the whole URL. Every rule
+    has a name, and reject_reason returns the name of the rule that matched so
+    rejections can be counted. Rules come from the [FILTER] section of
+    config.ini when present, otherwise from the defaults below. '''
+
+    DEFAULT_ALLOWED_HOSTS = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu")
+    # avoid UCI ML repository (very large datasets, per course warning)
+    DEFAULT_BLOCKED_HOSTS = ("archive.ics.uci.edu",)
+    DEFAULT_EXTENSIONS = (
+        "css", "js", "bmp", "gif", "jpe?g", "ico", "png", "tiff?", "mid", "mp2", "mp3", "mp4",
+        "mpg", "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf", "ps",
+        "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names", "data", "dat",
+        "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso", "epub", "dll", "cnf",
+        "tgz", "sha1", "thmx", "mso", "arff", "rtf", "jar", "csv", "rm", "smil", "wmv", "swf",
+        "wma", "zip", "rar", "gz")
+    # (reason, regex searched in the lowercased path)
+    DEFAULT_PATH_TRAPS = (
+        # dates in path (e.g. /2019/02/15/, or YYYYMMDD / YYYYMMDD-HHMMSS)
+        ("date_path", r"/\d{4}/\d{1,2}/\d{1,2}(/|$)"),
+        ("date_stamp", r"\d{8}"),
+        # repo commit pages
+        ("commit", r"/commit/[0-9a-f]{32,40}"),
+        # calendar/event traps, image galleries, bibliographies
+        ("events", r"/events?/"),
+        ("gallery", r"/pix"),
+        ("bibs", r"/bibs/"),
+        # login/sign-in pages (no crawlable content, often traps)
+        ("login_path", r"/(login|signin|sign-in|wp-login|user/login|auth)(/|$|\?)"),
+    )
+    # (reason, regex searched in the lowercased query)
+    DEFAULT_QUERY_TRAPS = (
+        ("version", r"version="),
+        ("from", r"from="),
+        # share links (same content as canonical URL)
+        ("share", r"share="),
+        ("login_query", r"(^|&)(login|signin|action=login)="),
+    )
+    # (reason, regex searched in the whole lowercased url)
+    DEFAULT_URL_TRAPS = (
+        ("date_query", r"date="),
+    )
+
+    def __init__(self, allowed_hosts=DEFAULT_ALLOWED_HOSTS, blocked_hosts=DEFAULT_BLOCKED_HOSTS,
+                 extensions=DEFAULT_EXTENSIONS, path_traps=DEFAULT_PATH_TRAPS,
+                 query_traps=DEFAULT_QUERY_TRAPS, url_traps=DEFAULT_URL_TRAPS):
+        # host is one of the allowed domains or a subdomain of one
+        self._host_re = re.compile(
+            r"(?:.*\.)?(?:" + "|".join(re.escape(h) for h in allowed_hosts) + r")")
+        self._blocked_hosts = frozenset(h.lower() for h in blocked_hosts)
+        self._extension_re = re.compile(r"\.(?:" + "|".join(extensions) + r")$")
+        self._path_re = self._combine(path_traps)
+        self._query_re = self._combine(query_traps)
+        self._url_re = self._combine(url_traps)
+
+    @staticmethod
+    def _combine(rules):
+        """One regex with a named group per rule; match.lastgroup is the reason."""
+        if not rules:
+            return None
+        return re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in rules))
+
+    @staticmethod
+    def _parse_rules(value):
+        """Lines of 'reason: regex' from config.ini."""
+        rules = list()
+        for line in value.strip().splitlines():
+            name, _, pattern = line.partition(":")
+            if pattern.strip():
+                rules.append((name.strip(), pattern.strip()))
+        return tuple(rules)
+
+    @staticmethod
+    def _parse_list(value):
+        return tuple(v.strip().lower() for v in re.split(r"[,\s]+", value) if v.strip())
+
+    @classmethod
+    def from_config(cls, rules):
+        ''' rules: the [FILTER] section of config.ini as a dict (keys lowercase);
+        missing keys fall back to the defaults. '''
+        kwargs = dict()
+        for key, arg in (("allowedhosts", "allowed_hosts"), ("blockedhosts", "blocked_hosts"),
+                         ("extensions", "extensions")):
+            if key in rules:
+                kwargs[arg] = cls._parse_list(rules[key])
+        for key, arg in (("pathtraps", "path_traps"), ("querytraps", "query_traps"),
+                         ("urltraps", "url_traps")):
+            if key in rules:
+                kwargs[arg] = cls._parse_rules(rules[key])
+        return cls(**kwargs)
+
+    def reject_reason(self, url):
+        """Name of the first rule url breaks, or None if it may be crawled."""
+        lower = url.lower()
+        split = _SPLIT_RE.match(lower)
+        if not split:
+            return "scheme"
+        if self._url_re:
+            match = self._url_re.search(lower)
+            if match:
+                return match.lastgroup
+        _, host, path, query = split.groups()
+        if not self._host_re.fullmatch(host):
+            return "host"
+        if host in self._blocked_hosts:
+            return "blocked_host"
+        # like urlparse, drop ;params from the last path segment
+        params = path.find(";", path.rfind("/"))
+        if params >= 0:
+            path = path[:params]
+        query = query or ""
+        if self._extension_re.search(path):
+            return "extension"
+        if self._path_re:
+            match = self._path_re.search(path)
+            if match:
+                return match.lastgroup
+        if self._query_re:
+            match = self._query_re.search(query)
+            if match:
+                return match.lastgroup
+        # php pages that take a url as an argument (redirectors, proxies)
+        if ".php" in path and "http" in query:
+            return "php_redirect"
+        return None
+
+    def is_valid(self, url):
+        return self.reject_reason(url) is None
+
+    def is_valid_many(self, urls):
+        """Rejection reason (None if valid) for each url, in order."""
+        reject_reason = self.reject_reason
+        return [reject_reason(url) for url in urls]